@@ -11,6 +11,9 @@ Usage:
     findings = analyze(image_bytes, mime_type="image/jpeg")
     print(findings.severity, findings.description)
     summary = findings.to_triage_summary()
+
+    # From async code:
+    findings = await analyze_async(image_bytes, mime_type="image/jpeg")
 """
 
 import json
@@ -22,9 +25,23 @@ from typing import Optional
 from pydantic import BaseModel, Field
 
 from src.models.medgemma import analyze_image as _model_analyze_image
+from src.models.medgemma import analyze_image_async as _model_analyze_image_async
 
 logger = logging.getLogger(__name__)
 
+# Shared decoder: raw_decode honours string quoting and stops at the object end
+_JSON_DECODER = json.JSONDecoder()
+
+# Raw response prefix kept as the description when JSON parsing fails
+_MAX_FALLBACK_DESCRIPTION = 500
+
+# The findings JSON fits well under _MAX_TOKENS; a reply that hits the limit
+# is retried once by the model layer with the larger budget.
+_MAX_TOKENS = 384
+_RETRY_MAX_TOKENS = 1024
+
+_SEVERITY_RE = re.compile(r"\b(CRITICAL|SEVERE|MODERATE|MILD|NORMAL)\b", re.IGNORECASE)
+
 
 # ---------------------------------------------------------------------------
 # Data models
@@ -41,6 +58,9 @@ class ImageSeverity(str, Enum):
     NORMAL = "NORMAL"
 
 
+_SEVERITY_BY_STR: dict[str, ImageSeverity] = {s.value: s for s in ImageSeverity}
+
+
 class ImageFindings(BaseModel):
     """Structured output from the image analysis agent."""
 
@@ -76,6 +96,19 @@ class ImageFindings(BaseModel):
         return " | ".join(parts)
 
 
+def _response_schema() -> dict:
+    """JSON schema for the model reply: ImageFindings minus bookkeeping fields."""
+    schema = ImageFindings.model_json_schema()
+    for field in ("raw_model_response", "parse_failed"):
+        schema["properties"].pop(field)
+    schema["required"] = list(schema["properties"])
+    return schema
+
+
+# Passed to the model for guided decoding so replies parse at Tier 1
+_IMAGE_RESPONSE_SCHEMA = _response_schema()
+
+
 # ---------------------------------------------------------------------------
 # System prompt
 # ---------------------------------------------------------------------------
@@ -124,6 +157,8 @@ Respond ONLY with valid JSON (no markdown, no backticks):
 }
 """
 
+_IMAGE_USER_PROMPT = "Analyze this medical image and provide structured findings."
+
 
 # ---------------------------------------------------------------------------
 # Internal helpers
@@ -132,69 +167,58 @@ Respond ONLY with valid JSON (no markdown, no backticks):
 
 def _build_image_prompt(clinical_context: Optional[str] = None) -> str:
     """Build the user prompt for image analysis."""
-    prompt = "Analyze this medical image and provide structured findings."
     if clinical_context:
-        prompt += f"\n\nClinical context: {clinical_context}"
-    return prompt
+        return f"{_IMAGE_USER_PROMPT}\n\nClinical context: {clinical_context}"
+    return _IMAGE_USER_PROMPT
 
 
 def _parse_image_response(raw: str) -> dict:
     """Parse model response into an image findings dict using three-tier strategy.
 
+    With guided decoding the reply is always Tier 1; the other tiers cover
+    endpoints that do not enforce the schema.
+
     Tier 1: Extract JSON object from response.
     Tier 2: Regex fallback — extract severity word from text.
     Tier 3: Default to MODERATE with parse_failed flag.
     """
-    # Tier 1: Try to find and parse a JSON object (brace-counting for nested JSON)
+    # Tier 1: Decode the JSON object starting at the first brace
     start = raw.find("{")
     if start != -1:
-        depth = 0
-        json_str = None
-        for i, ch in enumerate(raw[start:], start):
-            if ch == "{":
-                depth += 1
-            elif ch == "}":
-                depth -= 1
-            if depth == 0:
-                json_str = raw[start : i + 1]
-                break
-        if json_str:
-            try:
-                parsed = json.loads(json_str)
-                severity_str = str(parsed.get("severity", "")).upper().strip()
-                valid_severities = {s.value for s in ImageSeverity}
-                if severity_str in valid_severities:
-                    return {
-                        "modality": str(parsed.get("modality", "unknown")),
-                        "description": str(parsed.get("description", "")),
-                        "suspected_conditions": parsed.get("suspected_conditions", []),
-                        "severity": severity_str,
-                        "key_observations": parsed.get("key_observations", []),
-                        "confidence": max(
-                            0.0, min(1.0, float(parsed.get("confidence", 0.7)))
-                        ),
-                        "requires_specialist": bool(
-                            parsed.get("requires_specialist", False)
-                        ),
-                        "parse_failed": False,
-                    }
-            except (json.JSONDecodeError, ValueError, TypeError):
-                logger.warning(
-                    "JSON parsing failed, trying regex fallback",
-                    exc_info=True,
-                )
+        try:
+            parsed, _ = _JSON_DECODER.raw_decode(raw, start)
+            severity_str = str(parsed.get("severity", "")).upper().strip()
+            if severity_str in _SEVERITY_BY_STR:
+                return {
+                    "modality": str(parsed.get("modality", "unknown")),
+                    "description": str(parsed.get("description", "")),
+                    "suspected_conditions": parsed.get("suspected_conditions", []),
+                    "severity": severity_str,
+                    "key_observations": parsed.get("key_observations", []),
+                    "confidence": max(
+                        0.0, min(1.0, float(parsed.get("confidence", 0.7)))
+                    ),
+                    "requires_specialist": bool(
+                        parsed.get("requires_specialist", False)
+                    ),
+                    "parse_failed": False,
+                }
+        except (json.JSONDecodeError, ValueError, TypeError):
+            logger.warning(
+                "JSON parsing failed, trying regex fallback",
+                exc_info=True,
+            )
 
     # Tier 2: Regex fallback — look for severity mention
-    severity_pattern = r"\b(CRITICAL|SEVERE|MODERATE|MILD|NORMAL)\b"
-    severity_match = re.search(severity_pattern, raw.upper())
+    severity_match = _SEVERITY_RE.search(raw)
     if severity_match:
-        severity_str = severity_match.group(1)
+        severity_str = severity_match.group(1).upper()
         logger.warning(
             "Used regex fallback to extract image severity: %s", severity_str
         )
         return {
             "modality": "unknown",
-            "description": raw[:500],
+            "description": raw[:_MAX_FALLBACK_DESCRIPTION],
             "suspected_conditions": [],
             "severity": severity_str,
             "key_observations": [],
@@ -207,7 +231,7 @@ def _parse_image_response(raw: str) -> dict:
     logger.error("Could not parse severity from model response")
     return {
         "modality": "unknown",
-        "description": raw[:500],
+        "description": raw[:_MAX_FALLBACK_DESCRIPTION],
         "suspected_conditions": [],
         "severity": "MODERATE",
         "key_observations": [],
@@ -217,6 +241,62 @@ def _parse_image_response(raw: str) -> dict:
     }
 
 
+def _analysis_request(
+    image_bytes: bytes, mime_type: str, clinical_context: str | None
+) -> dict:
+    """Build the model call kwargs for one image.
+
+    Shared by analyze() and analyze_async(), which differ only in how they
+    await the model call.
+    """
+    logger.info("Calling MedGemma 4B for image analysis")
+    return {
+        "image": image_bytes,
+        "prompt": _build_image_prompt(clinical_context),
+        "system_prompt": _IMAGE_SYSTEM_PROMPT,
+        "mime_type": mime_type,
+        "max_tokens": _MAX_TOKENS,
+        "temperature": 0.1,
+        "json_schema": _IMAGE_RESPONSE_SCHEMA,
+        "retry_max_tokens": _RETRY_MAX_TOKENS,
+    }
+
+
+def _api_failure_findings() -> ImageFindings:
+    """Safe default returned when the model API call fails.
+
+    Called from the ``except`` block around the model call, so the active
+    exception is logged with it.
+    """
+    logger.error("MedGemma 4B API call failed", exc_info=True)
+    return ImageFindings(
+        modality="unknown",
+        description="Image analysis unavailable — model API call failed.",
+        severity=ImageSeverity.MODERATE,
+        confidence=0.0,
+        raw_model_response="",
+        parse_failed=True,
+    )
+
+
+def _findings_from_response(raw_response: str) -> ImageFindings:
+    """Parse a raw model response into ImageFindings."""
+    logger.info("Model response received (%d chars)", len(raw_response))
+    parsed = _parse_image_response(raw_response)
+
+    return ImageFindings(
+        modality=parsed["modality"],
+        description=parsed["description"],
+        suspected_conditions=parsed["suspected_conditions"],
+        severity=_SEVERITY_BY_STR.get(parsed["severity"], ImageSeverity.MODERATE),
+        key_observations=parsed["key_observations"],
+        confidence=parsed["confidence"],
+        requires_specialist=parsed["requires_specialist"],
+        raw_model_response=raw_response,
+        parse_failed=parsed["parse_failed"],
+    )
+
+
 # ---------------------------------------------------------------------------
 # Public API
 # ---------------------------------------------------------------------------
@@ -239,40 +319,34 @@ def analyze(
         On API failure, returns MODERATE with ``parse_failed=True`` and
         ``confidence=0.0`` as a safe default.
     """
-    user_prompt = _build_image_prompt(clinical_context)
-
-    logger.info("Calling MedGemma 4B for image analysis")
+    request = _analysis_request(image_bytes, mime_type, clinical_context)
     try:
-        raw_response = _model_analyze_image(
-            image=image_bytes,
-            prompt=user_prompt,
-            system_prompt=_IMAGE_SYSTEM_PROMPT,
-            mime_type=mime_type,
-            max_tokens=1024,
-            temperature=0.1,
-        )
+        raw_response = _model_analyze_image(**request)
     except Exception:
-        logger.error("MedGemma 4B API call failed", exc_info=True)
-        return ImageFindings(
-            modality="unknown",
-            description="Image analysis unavailable — model API call failed.",
-            severity=ImageSeverity.MODERATE,
-            confidence=0.0,
-            raw_model_response="",
-            parse_failed=True,
-        )
-    logger.info("Model response received (%d chars)", len(raw_response))
+        return _api_failure_findings()
+    return _findings_from_response(raw_response)
 
-    parsed = _parse_image_response(raw_response)
 
-    return ImageFindings(
-        modality=parsed["modality"],
-        description=parsed["description"],
-        suspected_conditions=parsed["suspected_conditions"],
-        severity=ImageSeverity(parsed["severity"]),
-        key_observations=parsed["key_observations"],
-        confidence=parsed["confidence"],
-        requires_specialist=parsed["requires_specialist"],
-        raw_model_response=raw_response,
-        parse_failed=parsed["parse_failed"],
-    )
+async def analyze_async(
+    image_bytes: bytes,
+    mime_type: str = "image/jpeg",
+    clinical_context: str | None = None,
+) -> ImageFindings:
+    """Async variant of analyze() for overlapping with other model calls.
+
+    Args:
+        image_bytes: Raw image bytes (JPEG, PNG, etc.).
+        mime_type: MIME type of the image.
+        clinical_context: Optional patient context to guide analysis.
+
+    Returns:
+        ImageFindings with severity, description, and observations.
+        On API failure, returns MODERATE with ``parse_failed=True`` and
+        ``confidence=0.0`` as a safe default.
+    """
+    request = _analysis_request(image_bytes, mime_type, clinical_context)
+    try:
+        raw_response = await _model_analyze_image_async(**request)
+    except Exception:
+        return _api_failure_findings()
+    return _findings_from_response(raw_response)
@@ -16,23 +16,45 @@ Usage:
     state = process_answer(state, "Começou há 30 minutos")
     # ... more turns ...
     patient = get_patient_data(state)  # -> PatientData for triage
+
+    # Several interviews at once (one model call per pair, sent together):
+    states = process_answers([(state_a, "Febre"), (state_b, "Tosse")])
+
+    # From async code, overlap a turn with image analysis:
+    findings, state = await asyncio.gather(
+        analyze_async(image_bytes), process_answer_async(state, "Tenho febre")
+    )
 """
 
 import json
 import logging
 import re
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 from typing import Optional
 
 from pydantic import BaseModel, Field
 
 from src.agents.triage import PatientData, VitalSigns
-from src.models.medgemma import generate_text
+from src.models.medgemma import generate_text, generate_text_async
 
 logger = logging.getLogger(__name__)
 
+# Shared decoder: raw_decode honours string quoting and stops at the object end
+_JSON_DECODER = json.JSONDecoder()
+
+_QUESTION_RE = re.compile(r"[^.!?\n]*\?")
+
 MAX_TURNS = 15
 
+# Upper bound on intake turns sent to the model at once by process_answers()
+MAX_CONCURRENT_TURNS = 8
+
+# A turn's JSON reply fits well under _MAX_TOKENS; a reply that hits the limit
+# is retried once by the model layer with the larger budget.
+_MAX_TOKENS = 384
+_RETRY_MAX_TOKENS = 1024
+
 # ---------------------------------------------------------------------------
 # Data models
 # ---------------------------------------------------------------------------
@@ -64,6 +86,19 @@ class IntakeState(BaseModel):
     raw_extraction_response: Optional[str] = None
 
 
+class IntakeTurnResponse(BaseModel):
+    """Shape of the model's JSON reply to one intake turn."""
+
+    next_question: Optional[str] = None
+    extracted_data: dict = Field(default_factory=dict)
+    is_complete: bool = False
+    clinical_notes: Optional[str] = None
+
+
+# Passed to the model for guided decoding so replies parse at Tier 1
+_INTAKE_RESPONSE_SCHEMA = IntakeTurnResponse.model_json_schema()
+
+
 # ---------------------------------------------------------------------------
 # System prompt
 # ---------------------------------------------------------------------------
@@ -133,16 +168,26 @@ IMPORTANT: extracted_data must contain ALL data collected so far across \
 all turns, not just data from this turn. Accumulate everything.
 """
 
-# Static fallback questions when model fails to generate one
-_FALLBACK_QUESTIONS = [
-    ("chief_complaint", "Qual é o motivo da sua visita hoje?"),
-    ("symptoms", "Você tem outros sintomas além da queixa principal?"),
-    ("onset", "Quando esses sintomas começaram?"),
-    ("pain_scale", "De 0 a 10, qual é o nível da sua dor?"),
-    ("history", "Você tem alguma doença ou já fez alguma cirurgia?"),
-    ("medications", "Está tomando algum medicamento?"),
-    ("allergies", "Tem alergia a algum medicamento ou substância?"),
-]
+# Static fallback questions when model fails to generate one, keyed by the
+# field they collect (insertion order is the order they are asked in)
+_FALLBACK_QUESTIONS: dict[str, str] = {
+    "chief_complaint": "Qual é o motivo da sua visita hoje?",
+    "symptoms": "Você tem outros sintomas além da queixa principal?",
+    "onset": "Quando esses sintomas começaram?",
+    "pain_scale": "De 0 a 10, qual é o nível da sua dor?",
+    "history": "Você tem alguma doença ou já fez alguma cirurgia?",
+    "medications": "Está tomando algum medicamento?",
+    "allergies": "Tem alergia a algum medicamento ou substância?",
+}
+_FINAL_FALLBACK_QUESTION = "Há algo mais que gostaria de informar?"
+
+# Static trailing instruction appended to every intake turn
+_INTAKE_TURN_INSTRUCTION = (
+    "\nUpdate extracted_data with ALL information collected so far "
+    "(accumulate, do not discard previous data). "
+    "Ask the next question or set is_complete=true if enough data is collected. "
+    "Respond with JSON only."
+)
 
 
 # ---------------------------------------------------------------------------
@@ -169,12 +214,7 @@ def _build_intake_prompt(state: IntakeState, answer: str) -> str:
         collected = json.dumps(state.extracted, ensure_ascii=False)
         sections.append(f"\n## Data collected so far\n{collected}")
 
-    sections.append(
-        "\nUpdate extracted_data with ALL information collected so far "
-        "(accumulate, do not discard previous data). "
-        "Ask the next question or set is_complete=true if enough data is collected. "
-        "Respond with JSON only."
-    )
+    sections.append(_INTAKE_TURN_INSTRUCTION)
 
     return "\n".join(sections)
 
@@ -182,40 +222,32 @@ def _build_intake_prompt(state: IntakeState, answer: str) -> str:
 def _parse_intake_response(raw: str) -> dict:
     """Parse model response into intake dict using three-tier strategy.
 
-    Tier 1: Extract JSON object via brace-counting.
+    With guided decoding the reply is always Tier 1; the other tiers cover
+    endpoints that do not enforce the schema.
+
+    Tier 1: Decode the JSON object starting at the first brace.
     Tier 2: Scan for a question-mark sentence as next_question.
     Tier 3: Static fallback.
     """
-    # Tier 1: Brace-counting JSON extraction (handles nested objects)
+    # Tier 1: Decode the JSON object starting at the first brace
     start = raw.find("{")
     if start != -1:
-        depth = 0
-        json_str = None
-        for i, ch in enumerate(raw[start:], start):
-            if ch == "{":
-                depth += 1
-            elif ch == "}":
-                depth -= 1
-            if depth == 0:
-                json_str = raw[start : i + 1]
-                break
-        if json_str:
-            try:
-                parsed = json.loads(json_str)
-                return {
-                    "next_question": parsed.get("next_question"),
-                    "extracted_data": parsed.get("extracted_data", {}),
-                    "is_complete": bool(parsed.get("is_complete", False)),
-                    "clinical_notes": parsed.get("clinical_notes"),
-                }
-            except (json.JSONDecodeError, ValueError, TypeError):
-                logger.warning(
-                    "JSON parsing failed, trying text fallback",
-                    exc_info=True,
-                )
+        try:
+            parsed, _ = _JSON_DECODER.raw_decode(raw, start)
+            return {
+                "next_question": parsed.get("next_question"),
+                "extracted_data": parsed.get("extracted_data", {}),
+                "is_complete": bool(parsed.get("is_complete", False)),
+                "clinical_notes": parsed.get("clinical_notes"),
+            }
+        except (json.JSONDecodeError, ValueError, TypeError):
+            logger.warning(
+                "JSON parsing failed, trying text fallback",
+                exc_info=True,
+            )
 
     # Tier 2: Look for a question-mark sentence
-    question_match = re.search(r"[^.!?\n]*\?", raw)
+    question_match = _QUESTION_RE.search(raw)
     if question_match:
         question = question_match.group(0).strip()
         logger.warning("Used text fallback to extract question: %s", question)
@@ -237,23 +269,31 @@ def _parse_intake_response(raw: str) -> dict:
 
 
 def _merge_extracted_data(previous: dict, new_data: dict) -> dict:
-    """Merge new extraction into previous, keeping previous values when new is null."""
+    """Merge new extraction into previous, keeping previous values when new is null.
+
+    Only the top level is copied; nested dicts (e.g., vital_signs) are copied
+    only when the new data contributes at least one non-null field, so the
+    previous state is never mutated.
+    """
     merged = dict(previous)
     for key, value in new_data.items():
         if value is None:
             continue
         if isinstance(value, list) and len(value) == 0:
             # Don't overwrite a populated list with an empty one
-            if key in merged and isinstance(merged[key], list) and len(merged[key]) > 0:
+            existing = merged.get(key)
+            if isinstance(existing, list) and len(existing) > 0:
                 continue
         if isinstance(value, dict):
-            # Recursive merge for nested dicts (e.g., vital_signs)
-            if key in merged and isinstance(merged[key], dict):
-                merged[key] = _merge_extracted_data(merged[key], value)
+            updates = {k: v for k, v in value.items() if v is not None}
+            # Only set if dict has at least one non-null value
+            if not updates:
+                continue
+            existing = merged.get(key)
+            if isinstance(existing, dict):
+                merged[key] = {**existing, **updates}
             else:
-                # Only set if dict has at least one non-null value
-                if any(v is not None for v in value.values()):
-                    merged[key] = value
+                merged[key] = value
         else:
             merged[key] = value
     return merged
@@ -261,10 +301,10 @@ def _merge_extracted_data(previous: dict, new_data: dict) -> dict:
 
 def _next_fallback_question(data: dict) -> str:
     """Return the next question from the static list based on missing fields."""
-    for field, question in _FALLBACK_QUESTIONS:
-        if field not in data or data[field] is None:
-            return question
-    return "Há algo mais que gostaria de informar?"
+    for field in _FALLBACK_QUESTIONS:
+        if data.get(field) is None:
+            return _FALLBACK_QUESTIONS[field]
+    return _FINAL_FALLBACK_QUESTION
 
 
 def _is_data_sufficient(data: dict) -> bool:
@@ -294,6 +334,116 @@ def _is_data_sufficient(data: dict) -> bool:
     return filled >= 3
 
 
+def _check_in_progress(state: IntakeState) -> None:
+    """Raise ValueError unless the interview can accept another answer."""
+    if state.status != IntakeStatus.IN_PROGRESS:
+        raise ValueError(
+            f"Cannot process answer: interview status is {state.status.value}"
+        )
+
+
+def _turn_request(state: IntakeState, answer: str) -> dict:
+    """Check the interview can take this answer and build the model call kwargs.
+
+    Shared by process_answer() and process_answer_async(), which differ only
+    in how they await the model call.
+    """
+    _check_in_progress(state)
+    logger.info("Calling MedGemma 27B for intake turn %d", state.turn_count + 1)
+    return {
+        "prompt": _build_intake_prompt(state, answer),
+        "system_prompt": _INTAKE_SYSTEM_PROMPT,
+        "max_tokens": _MAX_TOKENS,
+        "temperature": 0.3,
+        "json_schema": _INTAKE_RESPONSE_SCHEMA,
+        "retry_max_tokens": _RETRY_MAX_TOKENS,
+    }
+
+
+# States built below use model_construct: every field they receive is either
+# copied from an already-validated state or a freshly built ConversationTurn.
+
+
+def _fallback_state(state: IntakeState, answer: str) -> IntakeState:
+    """Record the answer and ask a static question after a failed model call.
+
+    Called from the ``except`` block around the model call, so the active
+    exception is logged with it.
+    """
+    logger.error(
+        "MedGemma API call failed for intake turn %d",
+        state.turn_count + 1,
+        exc_info=True,
+    )
+    fallback_q = _next_fallback_question(state.extracted)
+    return IntakeState.model_construct(
+        status=IntakeStatus.IN_PROGRESS,
+        conversation=state.conversation
+        + [
+            ConversationTurn(role="patient", content=answer),
+            ConversationTurn(role="agent", content=fallback_q),
+        ],
+        extracted=state.extracted,
+        pending_question=fallback_q,
+        turn_count=state.turn_count + 1,
+        raw_extraction_response=None,
+    )
+
+
+def _state_from_response(
+    state: IntakeState, answer: str, raw_response: str
+) -> IntakeState:
+    """Build the next IntakeState from the model's response to this turn."""
+    logger.info("Model response received (%d chars)", len(raw_response))
+
+    # Turns added this call; joined with the history once, at return
+    new_turns = [ConversationTurn(role="patient", content=answer)]
+    turn_count = state.turn_count + 1
+
+    # Parse response
+    parsed = _parse_intake_response(raw_response)
+
+    # Merge extracted data
+    extracted = _merge_extracted_data(state.extracted, parsed.get("extracted_data", {}))
+
+    # Determine next question
+    next_question = parsed.get("next_question")
+    if not next_question or not isinstance(next_question, str):
+        next_question = _next_fallback_question(extracted)
+
+    # Determine status
+    model_says_complete = parsed.get("is_complete", False)
+    data_sufficient = _is_data_sufficient(extracted)
+
+    if (model_says_complete and data_sufficient) or turn_count >= MAX_TURNS:
+        status = IntakeStatus.COMPLETE
+        if turn_count >= MAX_TURNS:
+            logger.warning(
+                "Intake reached max turns (%d), forcing completion", MAX_TURNS
+            )
+    else:
+        status = IntakeStatus.IN_PROGRESS
+        # Add agent question to conversation
+        new_turns.append(ConversationTurn(role="agent", content=next_question))
+
+    # Append clinical notes if present
+    if parsed.get("clinical_notes"):
+        notes = extracted.get("clinical_notes", "")
+        if notes:
+            extracted["clinical_notes"] = f"{notes}; {parsed['clinical_notes']}"
+        else:
+            extracted["clinical_notes"] = parsed["clinical_notes"]
+
+    return IntakeState.model_construct(
+        status=status,
+        conversation=state.conversation + new_turns,
+        extracted=extracted,
+        pending_question=next_question if status == IntakeStatus.IN_PROGRESS else None,
+        turn_count=turn_count,
+        raw_extraction_response=raw_response,
+    )
+
+
 # ---------------------------------------------------------------------------
 # Public API
 # ---------------------------------------------------------------------------
@@ -335,88 +485,64 @@ def process_answer(state: IntakeState, answer: str) -> IntakeState:
     Raises:
         ValueError: If the interview is already complete or aborted.
     """
-    if state.status != IntakeStatus.IN_PROGRESS:
-        raise ValueError(
-            f"Cannot process answer: interview status is {state.status.value}"
-        )
+    request = _turn_request(state, answer)
+    try:
+        raw_response = generate_text(**request)
+    except Exception:
+        return _fallback_state(state, answer)
+    return _state_from_response(state, answer, raw_response)
 
-    # Add patient answer to conversation
-    conversation = list(state.conversation)
-    conversation.append(ConversationTurn(role="patient", content=answer))
 
-    turn_count = state.turn_count + 1
+async def process_answer_async(state: IntakeState, answer: str) -> IntakeState:
+    """Async variant of process_answer().
+
+    Lets callers overlap an intake turn with other model calls, e.g.
+    ``await asyncio.gather(analyze_async(img), process_answer_async(s, a))``.
 
-    # Build prompt and call model
-    prompt = _build_intake_prompt(state, answer)
+    Args:
+        state: Current intake state.
+        answer: Patient's answer text.
+
+    Returns:
+        Updated IntakeState with new conversation turns, extracted data,
+        and next question (or COMPLETE status).
 
-    logger.info("Calling MedGemma 27B for intake turn %d", turn_count)
+    Raises:
+        ValueError: If the interview is already complete or aborted.
+    """
+    request = _turn_request(state, answer)
     try:
-        raw_response = generate_text(
-            prompt=prompt,
-            system_prompt=_INTAKE_SYSTEM_PROMPT,
-            max_tokens=1024,
-            temperature=0.3,
-        )
+        raw_response = await generate_text_async(**request)
     except Exception:
-        logger.error(
-            "MedGemma API call failed for intake turn %d",
-            turn_count,
-            exc_info=True,
-        )
-        fallback_q = _next_fallback_question(state.extracted)
-        conversation.append(ConversationTurn(role="agent", content=fallback_q))
-        return IntakeState(
-            status=IntakeStatus.IN_PROGRESS,
-            conversation=conversation,
-            extracted=state.extracted,
-            pending_question=fallback_q,
-            turn_count=turn_count,
-            raw_extraction_response=None,
-        )
-    logger.info("Model response received (%d chars)", len(raw_response))
-
-    # Parse response
-    parsed = _parse_intake_response(raw_response)
+        return _fallback_state(state, answer)
+    return _state_from_response(state, answer, raw_response)
 
-    # Merge extracted data
-    extracted = _merge_extracted_data(state.extracted, parsed.get("extracted_data", {}))
 
-    # Determine next question
-    next_question = parsed.get("next_question")
-    if not next_question:
-        next_question = _next_fallback_question(extracted)
+def process_answers(turns: list[tuple[IntakeState, str]]) -> list[IntakeState]:
+    """Process answers from several concurrent interviews in one batch.
 
-    # Determine status
-    model_says_complete = parsed.get("is_complete", False)
-    data_sufficient = _is_data_sufficient(extracted)
+    Each turn is an independent model call; dispatching them together keeps
+    several requests in flight so the serving endpoint can batch them
+    instead of handling one patient at a time.
 
-    if (model_says_complete and data_sufficient) or turn_count >= MAX_TURNS:
-        status = IntakeStatus.COMPLETE
-        if turn_count >= MAX_TURNS:
-            logger.warning(
-                "Intake reached max turns (%d), forcing completion", MAX_TURNS
-            )
-    else:
-        status = IntakeStatus.IN_PROGRESS
-        # Add agent question to conversation
-        conversation.append(ConversationTurn(role="agent", content=next_question))
+    Args:
+        turns: ``(state, answer)`` pairs, one per interview.
 
-    # Append clinical notes if present
-    if parsed.get("clinical_notes"):
-        notes = extracted.get("clinical_notes", "")
-        if notes:
-            extracted["clinical_notes"] = f"{notes}; {parsed['clinical_notes']}"
-        else:
-            extracted["clinical_notes"] = parsed["clinical_notes"]
+    Returns:
+        Updated IntakeState for each pair, in the same order.
 
-    return IntakeState(
-        status=status,
-        conversation=conversation,
-        extracted=extracted,
-        pending_question=next_question if status == IntakeStatus.IN_PROGRESS else None,
-        turn_count=turn_count,
-        raw_extraction_response=raw_response,
-    )
+    Raises:
+        ValueError: If any interview is already complete or aborted.
+    """
+    for state, _ in turns:
+        _check_in_progress(state)
+    if len(turns) <= 1:
+        return [process_answer(state, answer) for state, answer in turns]
+
+    logger.info("Processing %d intake turns concurrently", len(turns))
+    workers = min(len(turns), MAX_CONCURRENT_TURNS)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda turn: process_answer(*turn), turns))
 
 
 def get_patient_data(state: IntakeState) -> PatientData:
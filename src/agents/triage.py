@@ -13,20 +13,34 @@ Usage:
     )
     result = classify(patient)
     print(result.triage_color, result.reasoning)
+
+    # Several patients at once, from async code:
+    results = await classify_many([patient_a, patient_b])
 """
 
 import json
 import logging
 import re
+from collections.abc import Callable
 from enum import Enum
 from typing import Optional
 
 from pydantic import BaseModel, Field
 
-from src.models.medgemma import generate_text
+from src.models.medgemma import generate_text, generate_text_batch
 
 logger = logging.getLogger(__name__)
 
+# Shared decoder: raw_decode honours string quoting and stops at the object end
+_JSON_DECODER = json.JSONDecoder()
+
+# The triage JSON fits well under _MAX_TOKENS; a reply that hits the limit
+# is retried once by the model layer with the larger budget.
+_MAX_TOKENS = 256
+_RETRY_MAX_TOKENS = 1024
+
+_COLOR_RE = re.compile(r"\b(RED|ORANGE|YELLOW|GREEN|BLUE)\b", re.IGNORECASE)
+
 
 # ---------------------------------------------------------------------------
 # Data models
@@ -51,6 +65,8 @@ TRIAGE_LEVELS: dict[TriageColor, tuple[str, int]] = {
     TriageColor.BLUE: ("Não urgente", 240),
 }
 
+_VALID_COLORS = frozenset(c.value for c in TriageColor)
+
 
 class VitalSigns(BaseModel):
     """Patient vital signs — all fields optional."""
@@ -98,6 +114,24 @@ class TriageResult(BaseModel):
     parse_failed: bool = False
 
 
+def _response_schema() -> dict:
+    """JSON schema for the model reply: TriageResult minus derived fields."""
+    schema = TriageResult.model_json_schema()
+    for field in (
+        "triage_level",
+        "max_wait_minutes",
+        "raw_model_response",
+        "parse_failed",
+    ):
+        schema["properties"].pop(field)
+    schema["required"] = list(schema["properties"])
+    return schema
+
+
+# Passed to the model for guided decoding so replies parse at Tier 1
+_TRIAGE_RESPONSE_SCHEMA = _response_schema()
+
+
 # ---------------------------------------------------------------------------
 # System prompt
 # ---------------------------------------------------------------------------
@@ -153,16 +187,76 @@ Respond ONLY with valid JSON (no markdown, no backticks):
 """
 
 
+# Manchester prompt plus output-language instruction, built once per language
+_SYSTEM_PROMPTS: dict[str, str] = {
+    "en": _MANCHESTER_SYSTEM_PROMPT
+    + (
+        "\n\nThis is for an American medical application. "
+        "Your answer must be in English."
+    ),
+    "pt": _MANCHESTER_SYSTEM_PROMPT
+    + (
+        "\n\nThis is for a Brazilian medical application. "
+        "Your answer must be in Brazilian Portuguese."
+    ),
+}
+
+# (attribute, template) tables driving _build_user_prompt, in prompt order
+_PROMPT_FIELDS_BEFORE_VITALS: tuple[tuple[str, str], ...] = (
+    ("symptoms", "Symptoms: {}"),
+    ("onset", "Onset: {}"),
+    ("duration", "Duration: {}"),
+    ("pain_scale", "Pain scale: {}/10"),
+)
+
+_VITALS_FMT: tuple[tuple[str, str], ...] = (
+    ("heart_rate", "HR {} bpm"),
+    ("blood_pressure", "BP {} mmHg"),
+    ("respiratory_rate", "RR {}/min"),
+    ("temperature", "Temp {}°C"),
+    ("spo2", "SpO2 {}%"),
+    ("glucose", "Glucose {} mg/dL"),
+)
+
+_PROMPT_FIELDS_AFTER_VITALS: tuple[tuple[str, str], ...] = (
+    ("history", "Medical history: {}"),
+    ("medications", "Medications: {}"),
+    ("allergies", "Allergies: {}"),
+    ("image_findings", "Image findings: {}"),
+    ("notes", "Notes: {}"),
+)
+
+_USER_PROMPT_INSTRUCTION = (
+    "\nClassify this patient using the Manchester Triage System. "
+    "Respond with JSON only."
+)
+
+
 # ---------------------------------------------------------------------------
 # Internal helpers
 # ---------------------------------------------------------------------------
 
 
+def _append_fields(
+    sections: list[str], source: BaseModel, formats: tuple[tuple[str, str], ...]
+) -> None:
+    """Append each present field of ``source`` formatted by its template.
+
+    Missing values (None, empty string, empty list) are skipped; list values
+    are comma-joined.
+    """
+    for attr, fmt in formats:
+        value = getattr(source, attr)
+        if value is None or value == "" or value == []:
+            continue
+        if isinstance(value, list):
+            value = ", ".join(value)
+        sections.append(fmt.format(value))
+
+
 def _build_user_prompt(patient: PatientData) -> str:
     """Format patient data into a structured prompt for the model."""
-    sections: list[str] = []
-
-    sections.append(f"Chief complaint: {patient.chief_complaint}")
+    sections: list[str] = [f"Chief complaint: {patient.chief_complaint}"]
 
     if patient.age is not None or patient.sex:
         demo_parts: list[str] = []
@@ -172,105 +266,66 @@ def _build_user_prompt(patient: PatientData) -> str:
             demo_parts.append(patient.sex)
         sections.append(f"Demographics: {', '.join(demo_parts)}")
 
-    if patient.symptoms:
-        sections.append(f"Symptoms: {', '.join(patient.symptoms)}")
-
-    if patient.onset:
-        sections.append(f"Onset: {patient.onset}")
-
-    if patient.duration:
-        sections.append(f"Duration: {patient.duration}")
-
-    if patient.pain_scale is not None:
-        sections.append(f"Pain scale: {patient.pain_scale}/10")
+    _append_fields(sections, patient, _PROMPT_FIELDS_BEFORE_VITALS)
 
     if patient.vital_signs:
-        vs = patient.vital_signs
         vs_parts: list[str] = []
-        if vs.heart_rate is not None:
-            vs_parts.append(f"HR {vs.heart_rate} bpm")
-        if vs.blood_pressure:
-            vs_parts.append(f"BP {vs.blood_pressure} mmHg")
-        if vs.respiratory_rate is not None:
-            vs_parts.append(f"RR {vs.respiratory_rate}/min")
-        if vs.temperature is not None:
-            vs_parts.append(f"Temp {vs.temperature}°C")
-        if vs.spo2 is not None:
-            vs_parts.append(f"SpO2 {vs.spo2}%")
-        if vs.glucose is not None:
-            vs_parts.append(f"Glucose {vs.glucose} mg/dL")
+        _append_fields(vs_parts, patient.vital_signs, _VITALS_FMT)
         if vs_parts:
             sections.append(f"Vital signs: {', '.join(vs_parts)}")
 
-    if patient.history:
-        sections.append(f"Medical history: {', '.join(patient.history)}")
-
-    if patient.medications:
-        sections.append(f"Medications: {', '.join(patient.medications)}")
-
-    if patient.allergies:
-        sections.append(f"Allergies: {', '.join(patient.allergies)}")
+    _append_fields(sections, patient, _PROMPT_FIELDS_AFTER_VITALS)
 
-    if patient.image_findings:
-        sections.append(f"Image findings: {patient.image_findings}")
+    sections.append(_USER_PROMPT_INSTRUCTION)
 
-    if patient.notes:
-        sections.append(f"Notes: {patient.notes}")
+    return "\n".join(sections)
 
-    sections.append(
-        "\nClassify this patient using the Manchester Triage System. "
-        "Respond with JSON only."
-    )
 
-    return "\n".join(sections)
+def _as_str_list(value: object) -> list[str]:
+    """Coerce a model-supplied list field to list[str]; anything else is empty."""
+    if isinstance(value, list):
+        return [str(item) for item in value]
+    return []
 
 
 def _parse_triage_response(raw: str) -> dict:
     """Parse model response into a triage dict using three-tier strategy.
 
-    Tier 1: Extract JSON object from response.
+    With guided decoding the reply is always Tier 1; the other tiers cover
+    endpoints that do not enforce the schema.
+
+    Tier 1: Decode the JSON object starting at the first brace.
     Tier 2: Regex fallback — extract color from text.
     Tier 3: Default to YELLOW with parse_failed flag.
     """
-    # Tier 1: Try to find and parse a JSON object (brace-counting for nested JSON)
+    # Tier 1: Decode the JSON object starting at the first brace
     start = raw.find("{")
     if start != -1:
-        depth = 0
-        json_str = None
-        for i, ch in enumerate(raw[start:], start):
-            if ch == "{":
-                depth += 1
-            elif ch == "}":
-                depth -= 1
-            if depth == 0:
-                json_str = raw[start : i + 1]
-                break
-        if json_str:
-            try:
-                parsed = json.loads(json_str)
-                color_str = str(parsed.get("triage_color", "")).upper().strip()
-                valid_colors = {c.value for c in TriageColor}
-                if color_str in valid_colors:
-                    return {
-                        "triage_color": color_str,
-                        "reasoning": str(parsed.get("reasoning", "")),
-                        "key_discriminators": parsed.get("key_discriminators", []),
-                        "confidence": max(
-                            0.0, min(1.0, float(parsed.get("confidence", 0.7)))
-                        ),
-                        "parse_failed": False,
-                    }
-            except (json.JSONDecodeError, ValueError, TypeError):
-                logger.warning(
-                    "\033[33m\U000026a0\U0000fe0f  JSON parsing failed, "
-                    "trying regex fallback\033[0m"
-                )
+        try:
+            parsed, _ = _JSON_DECODER.raw_decode(raw, start)
+            color_str = str(parsed.get("triage_color", "")).upper().strip()
+            if color_str in _VALID_COLORS:
+                return {
+                    "triage_color": color_str,
+                    "reasoning": str(parsed.get("reasoning", "")),
+                    "key_discriminators": _as_str_list(
+                        parsed.get("key_discriminators")
+                    ),
+                    "confidence": max(
+                        0.0, min(1.0, float(parsed.get("confidence", 0.7)))
+                    ),
+                    "parse_failed": False,
+                }
+        except (json.JSONDecodeError, ValueError, TypeError):
+            logger.warning(
+                "\033[33m\U000026a0\U0000fe0f  JSON parsing failed, "
+                "trying regex fallback\033[0m"
+            )
 
     # Tier 2: Regex fallback — look for color mention
-    color_pattern = r"\b(RED|ORANGE|YELLOW|GREEN|BLUE)\b"
-    color_match = re.search(color_pattern, raw.upper())
+    color_match = _COLOR_RE.search(raw)
     if color_match:
-        color_str = color_match.group(1)
+        color_str = color_match.group(1).upper()
         logger.warning(
             "\033[33m\U000026a0\U0000fe0f  Regex fallback extracted color: %s\033[0m",
             color_str,
@@ -296,17 +351,60 @@ def _parse_triage_response(raw: str) -> dict:
     }
 
 
+# Results below use model_construct: every field is a constant or comes from
+# _parse_triage_response, which already normalizes types and clamps confidence.
+
+
+def _api_failure_result() -> TriageResult:
+    """Safe default returned when the model API call fails."""
+    return TriageResult.model_construct(
+        triage_color=TriageColor.YELLOW,
+        triage_level="Urgente",
+        max_wait_minutes=60,
+        reasoning="Model API call failed — defaulting to YELLOW for safety.",
+        key_discriminators=[],
+        confidence=0.0,
+        raw_model_response="",
+        parse_failed=True,
+    )
+
+
+def _result_from_response(raw_response: str) -> TriageResult:
+    """Parse a raw model response into a TriageResult."""
+    parsed = _parse_triage_response(raw_response)
+
+    triage_color = TriageColor(parsed["triage_color"])
+    level_name, max_wait = TRIAGE_LEVELS[triage_color]
+
+    return TriageResult.model_construct(
+        triage_color=triage_color,
+        triage_level=level_name,
+        max_wait_minutes=max_wait,
+        reasoning=parsed["reasoning"],
+        key_discriminators=parsed["key_discriminators"],
+        confidence=parsed["confidence"],
+        raw_model_response=raw_response,
+        parse_failed=parsed["parse_failed"],
+    )
+
+
 # ---------------------------------------------------------------------------
 # Public API
 # ---------------------------------------------------------------------------
 
 
-def classify(patient: PatientData, lang: str = "pt") -> TriageResult:
+def classify(
+    patient: PatientData,
+    lang: str = "pt",
+    on_delta: Callable[[str], None] | None = None,
+) -> TriageResult:
     """Classify a patient using the Manchester Triage System.
 
     Args:
         patient: Structured patient data with at least a chief complaint.
         lang: Language code (``"pt"`` or ``"en"``).
+        on_delta: Called with each chunk of the model's JSON reply as it
+            streams in, e.g. to show the reasoning before the result.
 
     Returns:
         TriageResult with color, reasoning, and key discriminators.
@@ -314,49 +412,36 @@ def classify(patient: PatientData, lang: str = "pt") -> TriageResult:
         ``confidence=0.0`` as a safe default.
     """
     user_prompt = _build_user_prompt(patient)
+    system_prompt = _SYSTEM_PROMPTS.get(lang, _SYSTEM_PROMPTS["pt"])
 
-    if lang == "en":
-        lang_instruction = (
-            "\n\nThis is for an American medical application. "
-            "Your answer must be in English."
-        )
-    else:
-        lang_instruction = (
-            "\n\nThis is for a Brazilian medical application. "
-            "Your answer must be in Brazilian Portuguese."
-        )
-    system_prompt = _MANCHESTER_SYSTEM_PROMPT + lang_instruction
-
+    # The system prompt is a fixed ~2 KB constant: log its size, not its text
     logger.info(
         "\n\033[36m"
         "============================================================\n"
         "\U0001f4e4  SENDING TO MEDGEMMA 27B\n"
         "============================================================\033[0m\n"
-        "\033[33m[SYSTEM PROMPT]\033[0m\n%s\n\n"
+        "\033[33m[SYSTEM PROMPT]\033[0m %d chars (lang=%s)\n\n"
         "\033[33m[USER PROMPT]\033[0m\n%s\n"
         "\033[36m============================================================\033[0m",
-        system_prompt,
+        len(system_prompt),
+        lang,
         user_prompt,
     )
+    logger.debug("\033[33m[SYSTEM PROMPT]\033[0m\n%s", system_prompt)
     try:
         raw_response = generate_text(
             prompt=user_prompt,
             system_prompt=system_prompt,
-            max_tokens=1024,
+            max_tokens=_MAX_TOKENS,
             temperature=0.1,
+            json_schema=_TRIAGE_RESPONSE_SCHEMA,
+            stream=True,
+            on_delta=on_delta,
+            retry_max_tokens=_RETRY_MAX_TOKENS,
         )
     except Exception:
         logger.error("\033[1;31m\u274c MedGemma API call failed\033[0m", exc_info=True)
-        return TriageResult(
-            triage_color=TriageColor.YELLOW,
-            triage_level="Urgente",
-            max_wait_minutes=60,
-            reasoning="Model API call failed — defaulting to YELLOW for safety.",
-            key_discriminators=[],
-            confidence=0.0,
-            raw_model_response="",
-            parse_failed=True,
-        )
+        return _api_failure_result()
     logger.info(
         "\n\033[32m"
         "============================================================\n"
@@ -368,18 +453,53 @@ def classify(patient: PatientData, lang: str = "pt") -> TriageResult:
         raw_response,
     )
 
-    parsed = _parse_triage_response(raw_response)
+    return _result_from_response(raw_response)
 
-    triage_color = TriageColor(parsed["triage_color"])
-    level_name, max_wait = TRIAGE_LEVELS[triage_color]
 
-    return TriageResult(
-        triage_color=triage_color,
-        triage_level=level_name,
-        max_wait_minutes=max_wait,
-        reasoning=parsed["reasoning"],
-        key_discriminators=parsed["key_discriminators"],
-        confidence=parsed["confidence"],
-        raw_model_response=raw_response,
-        parse_failed=parsed["parse_failed"],
-    )
+async def classify_many(
+    patients: list[PatientData], lang: str = "pt"
+) -> list[TriageResult]:
+    """Classify several patients with their model calls in flight together.
+
+    The prompts go out as one concurrent batch so the serving endpoint can
+    batch them, rather than one patient waiting on the previous one.
+
+    Args:
+        patients: Structured patient data, one entry per patient.
+        lang: Language code (``"pt"`` or ``"en"``).
+
+    Returns:
+        One TriageResult per patient, in the same order. A patient whose
+        call fails gets the same YELLOW safe default as classify().
+    """
+    if not patients:
+        return []
+
+    prompts = [_build_user_prompt(patient) for patient in patients]
+    system_prompt = _SYSTEM_PROMPTS.get(lang, _SYSTEM_PROMPTS["pt"])
+
+    logger.info("Classifying %d patients in one batch", len(patients))
+    try:
+        responses = await generate_text_batch(
+            prompts=prompts,
+            system_prompt=system_prompt,
+            max_tokens=_MAX_TOKENS,
+            temperature=0.1,
+            json_schema=_TRIAGE_RESPONSE_SCHEMA,
+            retry_max_tokens=_RETRY_MAX_TOKENS,
+        )
+    except Exception:
+        logger.error("\033[1;31m\u274c MedGemma API call failed\033[0m", exc_info=True)
+        return [_api_failure_result() for _ in patients]
+
+    results: list[TriageResult] = []
+    for raw_response in responses:
+        if isinstance(raw_response, Exception):
+            logger.error(
+                "\033[1;31m\u274c MedGemma API call failed\033[0m",
+                exc_info=raw_response,
+            )
+            results.append(_api_failure_result())
+        else:
+            results.append(_result_from_response(raw_response))
+    return results
@@ -2,39 +2,54 @@
 
 Converts patient data and triage classification into a valid FHIR R4
 Bundle containing Patient, Encounter, Condition, and Observation resources.
+
+Resources are assembled as plain dicts in FHIR JSON form, skipping
+per-resource pydantic validation on every triage. Set
+``STRICT_FHIR_VALIDATION=1`` to validate each bundle against the
+fhir.resources models before it is returned.
 """
 
+import logging
+import os
+import time
 import uuid
+from collections.abc import Callable
 from datetime import datetime, timezone
+from operator import attrgetter
 from typing import Optional
 
-from fhir.resources.bundle import Bundle, BundleEntry
-from fhir.resources.codeableconcept import CodeableConcept
-from fhir.resources.codeablereference import CodeableReference
-from fhir.resources.coding import Coding
-from fhir.resources.condition import Condition
-from fhir.resources.encounter import Encounter, EncounterReason
-from fhir.resources.humanname import HumanName
-from fhir.resources.observation import Observation, ObservationComponent
-from fhir.resources.patient import Patient
-from fhir.resources.quantity import Quantity
-from fhir.resources.reference import Reference
-
-from src.agents.triage import TRIAGE_LEVELS, PatientData, TriageResult
-
-# LOINC codes for vital signs
-_VITAL_LOINC = {
-    "heart_rate": ("8867-4", "Heart rate", "bpm"),
-    "blood_pressure": ("85354-9", "Blood pressure", "mmHg"),
-    "respiratory_rate": ("9279-1", "Respiratory rate", "/min"),
-    "temperature": ("8310-5", "Body temperature", "Cel"),
-    "spo2": ("2708-6", "Oxygen saturation", "%"),
-    "glucose": ("2339-0", "Glucose", "mg/dL"),
-}
+from fhir.resources.bundle import Bundle
+
+from src.agents.triage import TRIAGE_LEVELS, PatientData, TriageResult, VitalSigns
+
+logger = logging.getLogger(__name__)
+
+_UTC = timezone.utc
+
+# FHIR instant at second precision, UTC ("2025-01-31T12:00:00Z")
+_TIMESTAMP_FMT = "%Y-%m-%dT%H:%M:%SZ"
+
+_STRICT_VALIDATION = os.environ.get("STRICT_FHIR_VALIDATION", "0") == "1"
+
+# LOINC codes for vital signs: (VitalSigns getter, code, display, unit)
+_VITAL_LOINC: tuple[tuple[Callable[[VitalSigns], object], str, str, str], ...] = (
+    (attrgetter("heart_rate"), "8867-4", "Heart rate", "bpm"),
+    (attrgetter("blood_pressure"), "85354-9", "Blood pressure", "mmHg"),
+    (attrgetter("respiratory_rate"), "9279-1", "Respiratory rate", "/min"),
+    (attrgetter("temperature"), "8310-5", "Body temperature", "Cel"),
+    (attrgetter("spo2"), "2708-6", "Oxygen saturation", "%"),
+    (attrgetter("glucose"), "2339-0", "Glucose", "mg/dL"),
+)
+
+
+def _compact(data: dict) -> dict:
+    """Drop fields that are None or empty strings; FHIR R4 allows neither."""
+    return {k: v for k, v in data.items() if v is not None and v != ""}
 
 
 def _make_id() -> str:
-    return str(uuid.uuid4())
+    # 32-char hex form: a valid FHIR id without the dashed str() formatting
+    return uuid.uuid4().hex
 
 
 def _build_patient(
@@ -42,20 +57,21 @@ def _build_patient(
     name: str,
     age: Optional[int],
     sex: Optional[str],
-) -> Patient:
+) -> dict:
     gender = "unknown"
     if sex:
         gender = "male" if sex.upper() == "M" else "female"
 
-    birth_date = None
-    if age is not None:
-        birth_date = str(datetime.now(timezone.utc).year - age)
+    birth_date = str(time.gmtime().tm_year - age) if age is not None else None
 
-    return Patient(
-        id=patient_id,
-        name=[HumanName(use="official", text=name)],
-        gender=gender,
-        birthDate=birth_date,
+    return _compact(
+        {
+            "resourceType": "Patient",
+            "id": patient_id,
+            "name": [_compact({"use": "official", "text": name})],
+            "gender": gender,
+            "birthDate": birth_date,
+        }
     )
 
 
@@ -64,39 +80,36 @@ def _build_encounter(
     patient_id: str,
     triage_result: TriageResult,
     chief_complaint: str,
-) -> Encounter:
+) -> dict:
     level_name, _ = TRIAGE_LEVELS[triage_result.triage_color]
 
-    return Encounter(
-        id=encounter_id,
-        status="in-progress",
-        class_fhir=[
-            CodeableConcept(
-                coding=[
-                    Coding(
-                        system="http://terminology.hl7.org/CodeSystem/v3-ActCode",
-                        code="EMER",
-                        display="emergency",
-                    )
+    return {
+        "resourceType": "Encounter",
+        "id": encounter_id,
+        "status": "in-progress",
+        "class": [
+            {
+                "coding": [
+                    {
+                        "system": "http://terminology.hl7.org/CodeSystem/v3-ActCode",
+                        "code": "EMER",
+                        "display": "emergency",
+                    }
                 ]
-            )
+            }
         ],
-        subject=Reference(reference=f"Patient/{patient_id}"),
-        priority=CodeableConcept(
-            coding=[
-                Coding(
-                    system="http://hl7.org/fhir/v3/ActPriority",
-                    code=triage_result.triage_color.value,
-                    display=level_name,
-                )
+        "priority": {
+            "coding": [
+                {
+                    "system": "http://hl7.org/fhir/v3/ActPriority",
+                    "code": triage_result.triage_color.value,
+                    "display": level_name,
+                }
             ]
-        ),
-        reason=[
-            EncounterReason(
-                value=[CodeableReference(concept=CodeableConcept(text=chief_complaint))]
-            )
-        ],
-    )
+        },
+        "subject": {"reference": f"Patient/{patient_id}"},
+        "reason": [{"value": [{"concept": {"text": chief_complaint}}]}],
+    }
 
 
 def _build_triage_observation(
@@ -105,69 +118,70 @@ def _build_triage_observation(
     encounter_id: str,
     triage_result: TriageResult,
     patient_data: PatientData,
-) -> Observation:
+) -> dict:
     level_name, max_wait = TRIAGE_LEVELS[triage_result.triage_color]
 
-    components: list[ObservationComponent] = [
-        ObservationComponent(
-            code=CodeableConcept(text="Confidence"),
-            valueQuantity=Quantity(value=triage_result.confidence, unit="ratio"),
-        ),
-        ObservationComponent(
-            code=CodeableConcept(text="Reasoning"),
-            valueString=triage_result.reasoning,
-        ),
+    components: list[dict] = [
+        {
+            "code": {"text": "Confidence"},
+            "valueQuantity": {"value": triage_result.confidence, "unit": "ratio"},
+        },
     ]
+    if triage_result.reasoning:
+        components.append(
+            {"code": {"text": "Reasoning"}, "valueString": triage_result.reasoning}
+        )
 
     # Add vital signs as components
     if patient_data.vital_signs:
         vs = patient_data.vital_signs
-        for field, (loinc, display, unit) in _VITAL_LOINC.items():
-            value = getattr(vs, field, None)
-            if value is None or value == 0 or value == 0.0 or value == "":
+        for getter, code, name, unit in _VITAL_LOINC:
+            value = getter(vs)
+            if value is None or value == 0 or value == "":
                 continue
-            comp = ObservationComponent(
-                code=CodeableConcept(
-                    coding=[
-                        Coding(system="http://loinc.org", code=loinc, display=display)
+            comp: dict = {
+                "code": {
+                    "coding": [
+                        {"system": "http://loinc.org", "code": code, "display": name}
                     ]
-                ),
-            )
+                }
+            }
             if isinstance(value, str):
-                comp.valueString = f"{value} {unit}"
+                comp["valueString"] = f"{value} {unit}"
             else:
-                comp.valueQuantity = Quantity(value=float(value), unit=unit)
+                comp["valueQuantity"] = {"value": float(value), "unit": unit}
             components.append(comp)
 
-    return Observation(
-        id=observation_id,
-        status="final",
-        code=CodeableConcept(
-            coding=[
-                Coding(
-                    system="http://loinc.org",
-                    code="56838-1",
-                    display="Manchester Triage Category",
-                )
+    return {
+        "resourceType": "Observation",
+        "id": observation_id,
+        "status": "final",
+        "code": {
+            "coding": [
+                {
+                    "system": "http://loinc.org",
+                    "code": "56838-1",
+                    "display": "Manchester Triage Category",
+                }
             ],
-            text="Classificação de Risco Manchester",
-        ),
-        subject=Reference(reference=f"Patient/{patient_id}"),
-        encounter=Reference(reference=f"Encounter/{encounter_id}"),
-        valueCodeableConcept=CodeableConcept(
-            coding=[
-                Coding(
-                    code=triage_result.triage_color.value,
-                    display=level_name,
-                )
+            "text": "Classificação de Risco Manchester",
+        },
+        "subject": {"reference": f"Patient/{patient_id}"},
+        "encounter": {"reference": f"Encounter/{encounter_id}"},
+        "valueCodeableConcept": {
+            "coding": [
+                {
+                    "code": triage_result.triage_color.value,
+                    "display": level_name,
+                }
             ],
-            text=(
+            "text": (
                 f"{triage_result.triage_color.value} — {level_name} "
                 f"(máx {max_wait} min)"
             ),
-        ),
-        component=components,
-    )
+        },
+        "component": components,
+    }
 
 
 def _build_condition(
@@ -175,21 +189,22 @@ def _build_condition(
     patient_id: str,
     encounter_id: str,
     chief_complaint: str,
-) -> Condition:
-    return Condition(
-        id=condition_id,
-        clinicalStatus=CodeableConcept(
-            coding=[
-                Coding(
-                    system="http://terminology.hl7.org/CodeSystem/condition-clinical",
-                    code="active",
-                )
+) -> dict:
+    return {
+        "resourceType": "Condition",
+        "id": condition_id,
+        "clinicalStatus": {
+            "coding": [
+                {
+                    "system": "http://terminology.hl7.org/CodeSystem/condition-clinical",
+                    "code": "active",
+                }
             ]
-        ),
-        subject=Reference(reference=f"Patient/{patient_id}"),
-        encounter=Reference(reference=f"Encounter/{encounter_id}"),
-        code=CodeableConcept(text=chief_complaint),
-    )
+        },
+        "code": {"text": chief_complaint},
+        "subject": {"reference": f"Patient/{patient_id}"},
+        "encounter": {"reference": f"Encounter/{encounter_id}"},
+    }
 
 
 def build_fhir_bundle(
@@ -227,39 +242,44 @@ def build_fhir_bundle(
     # additional metadata. Each entry here holds a core clinical
     # resource generated during the triage process.
 
-    bundle = Bundle(
-        id=_make_id(),
-        type="collection",
-        timestamp=datetime.now(timezone.utc).isoformat(),
-        entry=[
-            BundleEntry(
-                resource=_build_patient(
+    bundle = {
+        "resourceType": "Bundle",
+        "id": _make_id(),
+        "type": "collection",
+        "timestamp": datetime.now(_UTC).strftime(_TIMESTAMP_FMT),
+        "entry": [
+            {
+                "resource": _build_patient(
                     patient_id, patient_name, patient_age, patient_sex
                 )
-            ),
-            BundleEntry(
-                resource=_build_encounter(
+            },
+            {
+                "resource": _build_encounter(
                     encounter_id,
                     patient_id,
                     triage_result,
                     patient_data.chief_complaint,
                 )
-            ),
-            BundleEntry(
-                resource=_build_triage_observation(
+            },
+            {
+                "resource": _build_triage_observation(
                     observation_id,
                     patient_id,
                     encounter_id,
                     triage_result,
                     patient_data,
                 )
-            ),
-            BundleEntry(
-                resource=_build_condition(
+            },
+            {
+                "resource": _build_condition(
                     condition_id, patient_id, encounter_id, patient_data.chief_complaint
                 )
-            ),
+            },
         ],
-    )
+    }
+
+    if _STRICT_VALIDATION:
+        Bundle.model_validate(bundle)
+        logger.debug("FHIR Bundle passed strict validation")
 
-    return bundle.model_dump(mode="json", exclude_none=True)
+    return bundle
@@ -1,88 +1,107 @@
 """MedGemma model interface for Vertex AI dedicated endpoints.
 
 All model inference goes through this module. Agents must never call
-models directly — they call generate_text() or analyze_image() instead.
+models directly — they call generate_text() or analyze_image() (or their
+``*_async`` variants, or generate_text_batch()) instead.
 
 Architecture:
-    - OpenAI SDK pointed at Vertex AI dedicated endpoint DNS
+    - OpenAI SDK pointed at Vertex AI dedicated endpoint DNS, over HTTP/2
     - GCP bearer token from service account (base64 env var)
-    - Sync calls (LangGraph wraps in async when needed)
+    - Sync calls plus async variants for overlapping independent requests
+    - generate_text_batch() sends many prompts concurrently over one client
+    - Replies cut off at max_tokens (finish reason "length") are reissued
+      once when the caller passes retry_max_tokens
     - Exceptions bubble up — agents handle retries
 """
 
-import atexit
+import asyncio
 import base64
+import json
 import logging
 import os
-import tempfile
+import threading
+from collections.abc import Callable
 from typing import Optional
 
 import google.auth.transport.requests
+import httpx
 from dotenv import load_dotenv
 from google.oauth2 import service_account
-from openai import OpenAI
+from openai import DEFAULT_TIMEOUT, AsyncOpenAI, BadRequestError, OpenAI, Stream
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
 # ---------------------------------------------------------------------------
-# GCP credential bootstrap (module-level, runs once at import)
+# GCP credential bootstrap (lazy, runs once per process)
 # ---------------------------------------------------------------------------
 
-_CREDS_PATH: Optional[str] = None
 _CREDENTIALS: Optional[service_account.Credentials] = None
 
-_MEDGEMMA_27B_MODEL = "google/medgemma-27b-text-it"
-_MEDGEMMA_4B_MODEL = "google/medgemma-4b-it"
+# Serializes credential loading and token refresh across threads
+_CREDS_LOCK = threading.Lock()
 
+# Served model names. Override to target a different deployment of the same
+# endpoint, e.g. an AWQ/FP8-quantized MedGemma served under its own name.
+_MEDGEMMA_27B_MODEL = os.environ.get(
+    "MEDGEMMA_27B_MODEL", "google/medgemma-27b-text-it"
+)
+_MEDGEMMA_4B_MODEL = os.environ.get("MEDGEMMA_4B_MODEL", "google/medgemma-4b-it")
 
-def _init_credentials() -> None:
-    """Decode base64 service account JSON to a temp file and load credentials."""
-    global _CREDS_PATH, _CREDENTIALS
+# Upper bound on requests generate_text_batch() keeps in flight at once;
+# override to match the endpoint's batch size
+MAX_BATCH_CONCURRENCY = int(os.environ.get("MEDGEMMA_MAX_BATCH_CONCURRENCY", "16"))
 
-    if _CREDENTIALS is not None:
-        return
+# Client-side retries for transient endpoint failures (connection errors,
+# 408/429/5xx), with exponential backoff applied by the OpenAI SDK
+MAX_RETRIES = int(os.environ.get("MEDGEMMA_MAX_RETRIES", "2"))
 
-    b64 = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS_BASE64")
-    if not b64:
-        raise EnvironmentError(
-            "GOOGLE_APPLICATION_CREDENTIALS_BASE64 is not set. "
-            "See .env.example for required environment variables."
-        )
+# Schema-guided decoding (vLLM ``guided_json``); set to 0 for endpoints whose
+# server does not accept it. An endpoint that rejects it with a 400 is also
+# retried without it and remembered in _GUIDED_UNSUPPORTED.
+_GUIDED_DECODING = os.environ.get("MEDGEMMA_GUIDED_DECODING", "1") != "0"
 
-    decoded = base64.b64decode(b64).decode("utf-8")
-    fd, path = tempfile.mkstemp(suffix=".json", prefix="gcp-creds-")
-    os.close(fd)
-    with open(path, "w") as f:
-        f.write(decoded)
-    os.chmod(path, 0o600)
-    _CREDS_PATH = path
-    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = path
-
-    _CREDENTIALS = service_account.Credentials.from_service_account_file(
-        path, scopes=["https://www.googleapis.com/auth/cloud-platform"]
-    )
-    logger.info("GCP credentials loaded from base64 env var")
+# Base URLs of endpoints that rejected ``guided_json``
+_GUIDED_UNSUPPORTED: set[str] = set()
 
 
-def _cleanup_credentials() -> None:
-    """Remove temp credentials file on process exit."""
-    if _CREDS_PATH and os.path.exists(_CREDS_PATH):
-        try:
-            os.unlink(_CREDS_PATH)
-        except OSError:
-            pass
+def _init_credentials() -> None:
+    """Decode the base64 service account JSON and load credentials in memory."""
+    global _CREDENTIALS
 
+    if _CREDENTIALS is not None:
+        return
 
-atexit.register(_cleanup_credentials)
+    with _CREDS_LOCK:
+        # Another thread may have finished loading while this one waited
+        if _CREDENTIALS is not None:
+            return
+
+        b64 = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS_BASE64")
+        if not b64:
+            raise EnvironmentError(
+                "GOOGLE_APPLICATION_CREDENTIALS_BASE64 is not set. "
+                "See .env.example for required environment variables."
+            )
+
+        info = json.loads(base64.b64decode(b64))
+        _CREDENTIALS = service_account.Credentials.from_service_account_info(
+            info, scopes=["https://www.googleapis.com/auth/cloud-platform"]
+        )
+        logger.info("GCP credentials loaded from base64 env var")
 
 
 def _get_token() -> str:
-    """Return a fresh GCP bearer token."""
+    """Return a valid GCP bearer token, refreshing only near expiry."""
     _init_credentials()
     assert _CREDENTIALS is not None
-    _CREDENTIALS.refresh(google.auth.transport.requests.Request())
+    # ``valid`` turns False a few minutes before expiry (google-auth clock skew)
+    if not _CREDENTIALS.valid:
+        with _CREDS_LOCK:
+            if not _CREDENTIALS.valid:
+                _CREDENTIALS.refresh(google.auth.transport.requests.Request())
     if not _CREDENTIALS.token:
         raise RuntimeError("Failed to obtain GCP access token")
     return _CREDENTIALS.token
@@ -92,14 +111,296 @@ def _get_token() -> str:
 # OpenAI client factories (lazy, one per endpoint)
 # ---------------------------------------------------------------------------
 
+# Sync clients keyed by endpoint base URL. Async clients are not cached: their
+# connection pool is tied to the event loop that created it.
+_CLIENTS: dict[str, OpenAI] = {}
+
+# HTTP/2 lets concurrent requests to one endpoint share a TLS connection
+_HTTP_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+
 
 def _make_client(base_url_env: str) -> OpenAI:
-    """Create an OpenAI client pointed at a Vertex AI dedicated endpoint."""
+    """Return the cached OpenAI client for a Vertex AI dedicated endpoint.
+
+    The client (and its connection pool) is built once per endpoint; only
+    its bearer token is updated when the GCP token rotates.
+    """
     base_url = os.environ.get(base_url_env)
     if not base_url:
         raise EnvironmentError(f"{base_url_env} is not set")
     token = _get_token()
-    return OpenAI(base_url=base_url, api_key=token)
+    client = _CLIENTS.get(base_url)
+    if client is None:
+        client = OpenAI(
+            base_url=base_url,
+            api_key=token,
+            max_retries=MAX_RETRIES,
+            http_client=httpx.Client(
+                http2=True, limits=_HTTP_LIMITS, timeout=DEFAULT_TIMEOUT
+            ),
+        )
+        _CLIENTS[base_url] = client
+    else:
+        client.api_key = token
+    return client
+
+
+def _make_async_client(base_url_env: str) -> AsyncOpenAI:
+    """Create an AsyncOpenAI client pointed at a Vertex AI dedicated endpoint."""
+    base_url = os.environ.get(base_url_env)
+    if not base_url:
+        raise EnvironmentError(f"{base_url_env} is not set")
+    token = _get_token()
+    return AsyncOpenAI(
+        base_url=base_url,
+        api_key=token,
+        max_retries=MAX_RETRIES,
+        http_client=httpx.AsyncClient(
+            http2=True, limits=_HTTP_LIMITS, timeout=DEFAULT_TIMEOUT
+        ),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Message builders (shared by sync and async calls)
+# ---------------------------------------------------------------------------
+
+
+def _text_messages(prompt: str, system_prompt: str | None) -> list[dict]:
+    """Build the chat messages for a text-only request."""
+    messages: list[dict] = []
+    if system_prompt:
+        messages.append({"role": "system", "content": system_prompt})
+    messages.append({"role": "user", "content": prompt})
+    return messages
+
+
+def _image_messages(
+    image: bytes, prompt: str, system_prompt: str | None, mime_type: str
+) -> list[dict]:
+    """Build the chat messages for a multimodal request with one image."""
+    # Base64 output is pure ASCII, which decodes without UTF-8 validation
+    image_b64 = base64.b64encode(image).decode("ascii")
+
+    messages: list[dict] = []
+    if system_prompt:
+        messages.append({"role": "system", "content": system_prompt})
+    messages.append(
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": prompt},
+                {
+                    "type": "image_url",
+                    "image_url": {"url": f"data:{mime_type};base64,{image_b64}"},
+                },
+            ],
+        }
+    )
+    return messages
+
+
+def _guided_body(client: OpenAI | AsyncOpenAI, json_schema: dict | None) -> dict | None:
+    """Build the request extra_body that constrains output to a JSON schema."""
+    if (
+        json_schema is None
+        or not _GUIDED_DECODING
+        or str(client.base_url) in _GUIDED_UNSUPPORTED
+    ):
+        return None
+    return {"guided_json": json_schema}
+
+
+def _mark_guided_unsupported(client: OpenAI | AsyncOpenAI) -> None:
+    """Stop sending ``guided_json`` to an endpoint that rejected it."""
+    logger.warning(
+        "Endpoint %s rejected guided_json; sending requests without it",
+        client.base_url,
+    )
+    _GUIDED_UNSUPPORTED.add(str(client.base_url))
+
+
+def _create(
+    client: OpenAI, json_schema: dict | None, **kwargs: object
+) -> ChatCompletion | Stream[ChatCompletionChunk]:
+    """Create a chat completion, dropping ``guided_json`` if the endpoint rejects it.
+
+    The endpoint is only marked as unsupported once the same request succeeds
+    without the schema, so a 400 with another cause still raises.
+    """
+    extra_body = _guided_body(client, json_schema)
+    try:
+        return client.chat.completions.create(extra_body=extra_body, **kwargs)
+    except BadRequestError:
+        if extra_body is None:
+            raise
+        response = client.chat.completions.create(**kwargs)
+        _mark_guided_unsupported(client)
+        return response
+
+
+async def _acreate(
+    client: AsyncOpenAI, json_schema: dict | None, **kwargs: object
+) -> ChatCompletion:
+    """Async variant of _create()."""
+    extra_body = _guided_body(client, json_schema)
+    try:
+        return await client.chat.completions.create(extra_body=extra_body, **kwargs)
+    except BadRequestError:
+        if extra_body is None:
+            raise
+        response = await client.chat.completions.create(**kwargs)
+        _mark_guided_unsupported(client)
+        return response
+
+
+def _read_until_json_closes(
+    stream: Stream[ChatCompletionChunk],
+    on_delta: Callable[[str], None] | None = None,
+) -> tuple[str, str | None]:
+    """Collect streamed text, closing the stream once the first JSON object ends.
+
+    Quotes are tracked only inside the object, so prose before it (e.g. an
+    apostrophe) cannot hide the closing brace. ``on_delta``, if given, is
+    called with each text delta as it arrives.
+
+    Returns:
+        The text and the choice's finish reason. A stream closed at the end
+        of the object reports ``"stop"``.
+    """
+    parts: list[str] = []
+    finish_reason: str | None = None
+    depth = 0
+    in_string = False
+    escaped = False
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        choice = chunk.choices[0]
+        finish_reason = choice.finish_reason or finish_reason
+        text = choice.delta.content or ""
+        parts.append(text)
+        if on_delta is not None and text:
+            on_delta(text)
+        for ch in text:
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == "\\":
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == "{":
+                depth += 1
+            elif depth and ch == '"':
+                in_string = True
+            elif depth and ch == "}":
+                depth -= 1
+                if depth == 0:
+                    # Dropping the connection makes the server abort generation
+                    stream.close()
+                    return "".join(parts), "stop"
+    return "".join(parts), finish_reason
+
+
+# ---------------------------------------------------------------------------
+# Completion helpers (shared by the public calls)
+# ---------------------------------------------------------------------------
+
+
+def _should_retry(
+    finish_reason: str | None, max_tokens: int, retry_max_tokens: int | None
+) -> bool:
+    """Return True if a reply hit its token limit and a larger budget is set."""
+    if finish_reason != "length" or retry_max_tokens is None:
+        return False
+    if retry_max_tokens <= max_tokens:
+        return False
+    logger.warning(
+        "MedGemma reply cut off at %d tokens, retrying with %d",
+        max_tokens,
+        retry_max_tokens,
+    )
+    return True
+
+
+def _complete(
+    client: OpenAI,
+    json_schema: dict | None,
+    stream: bool = False,
+    on_delta: Callable[[str], None] | None = None,
+    **kwargs: object,
+) -> tuple[str, str | None]:
+    """Issue one completion and return its text and finish reason."""
+    if stream:
+        return _read_until_json_closes(
+            _create(client, json_schema, stream=True, **kwargs), on_delta
+        )
+    choice = _create(client, json_schema, **kwargs).choices[0]
+    return choice.message.content, choice.finish_reason
+
+
+def _complete_with_retry(
+    client: OpenAI,
+    json_schema: dict | None,
+    max_tokens: int,
+    retry_max_tokens: int | None,
+    stream: bool = False,
+    on_delta: Callable[[str], None] | None = None,
+    **kwargs: object,
+) -> str:
+    """Issue a completion, reissuing it once if it stops at ``max_tokens``.
+
+    ``on_delta`` only sees the first attempt: the retry's text would be
+    appended to the truncated reply the caller has already been shown.
+    """
+    text, finish_reason = _complete(
+        client, json_schema, stream, on_delta, max_tokens=max_tokens, **kwargs
+    )
+    if _should_retry(finish_reason, max_tokens, retry_max_tokens):
+        text, _ = _complete(
+            client, json_schema, stream, None, max_tokens=retry_max_tokens, **kwargs
+        )
+    return text
+
+
+async def _acomplete_with_retry(
+    client: AsyncOpenAI,
+    json_schema: dict | None,
+    max_tokens: int,
+    retry_max_tokens: int | None,
+    **kwargs: object,
+) -> str:
+    """Async variant of _complete_with_retry() (no streaming)."""
+    choice = (
+        await _acreate(client, json_schema, max_tokens=max_tokens, **kwargs)
+    ).choices[0]
+    if _should_retry(choice.finish_reason, max_tokens, retry_max_tokens):
+        choice = (
+            await _acreate(client, json_schema, max_tokens=retry_max_tokens, **kwargs)
+        ).choices[0]
+    return choice.message.content
+
+
+async def _create_text(
+    client: AsyncOpenAI,
+    prompt: str,
+    system_prompt: str | None,
+    max_tokens: int,
+    temperature: float,
+    json_schema: dict | None,
+    retry_max_tokens: int | None,
+) -> str:
+    """Issue one MedGemma 27B text completion on an open async client."""
+    return await _acomplete_with_retry(
+        client,
+        json_schema,
+        max_tokens,
+        retry_max_tokens,
+        model=_MEDGEMMA_27B_MODEL,
+        messages=_text_messages(prompt, system_prompt),
+        temperature=temperature,
+    )
 
 
 # ---------------------------------------------------------------------------
@@ -112,6 +413,10 @@ def generate_text(
     system_prompt: str | None = None,
     max_tokens: int = 2048,
     temperature: float = 0.2,
+    json_schema: dict | None = None,
+    stream: bool = False,
+    on_delta: Callable[[str], None] | None = None,
+    retry_max_tokens: int | None = None,
 ) -> str:
     """Generate text using MedGemma 27B (text-only, clinical reasoning).
 
@@ -120,6 +425,14 @@ def generate_text(
         system_prompt: Optional system message for role setting.
         max_tokens: Maximum completion tokens.
         temperature: Sampling temperature.
+        json_schema: Optional JSON schema the response must conform to.
+        stream: Stream the response and stop reading (aborting generation)
+            as soon as the first JSON object closes. For JSON-only replies.
+        on_delta: Called with each text delta while streaming, e.g. to show
+            partial output. Ignored unless ``stream`` is True, and not
+            called for the ``retry_max_tokens`` retry.
+        retry_max_tokens: If the reply stops at ``max_tokens`` (finish
+            reason ``"length"``), reissue it once with this larger budget.
 
     Returns:
         The model's text response.
@@ -137,18 +450,17 @@ def generate_text(
     )
     client = _make_client("MEDGEMMA_27B_BASE_URL")
 
-    messages: list[dict] = []
-    if system_prompt:
-        messages.append({"role": "system", "content": system_prompt})
-    messages.append({"role": "user", "content": prompt})
-
-    response = client.chat.completions.create(
+    result = _complete_with_retry(
+        client,
+        json_schema,
+        max_tokens,
+        retry_max_tokens,
+        stream,
+        on_delta,
         model=_MEDGEMMA_27B_MODEL,
-        messages=messages,
-        max_tokens=max_tokens,
+        messages=_text_messages(prompt, system_prompt),
         temperature=temperature,
     )
-    result = response.choices[0].message.content
     logger.info(
         "\033[35m\U00002705 MedGemma 27B done — %d chars returned\033[0m",
         len(result),
@@ -163,6 +475,8 @@ def analyze_image(
     mime_type: str = "image/jpeg",
     max_tokens: int = 2048,
     temperature: float = 0.2,
+    json_schema: dict | None = None,
+    retry_max_tokens: int | None = None,
 ) -> str:
     """Analyze a medical image using MedGemma 4B (multimodal).
 
@@ -173,6 +487,9 @@ def analyze_image(
         mime_type: MIME type of the image (default: image/jpeg).
         max_tokens: Maximum completion tokens.
         temperature: Sampling temperature.
+        json_schema: Optional JSON schema the response must conform to.
+        retry_max_tokens: If the reply stops at ``max_tokens`` (finish
+            reason ``"length"``), reissue it once with this larger budget.
 
     Returns:
         The model's text response describing the image.
@@ -183,28 +500,159 @@ def analyze_image(
     """
     client = _make_client("MEDGEMMA_4B_BASE_URL")
 
-    image_b64 = base64.b64encode(image).decode("utf-8")
+    return _complete_with_retry(
+        client,
+        json_schema,
+        max_tokens,
+        retry_max_tokens,
+        model=_MEDGEMMA_4B_MODEL,
+        messages=_image_messages(image, prompt, system_prompt, mime_type),
+        temperature=temperature,
+    )
 
-    messages: list[dict] = []
-    if system_prompt:
-        messages.append({"role": "system", "content": system_prompt})
-    messages.append(
-        {
-            "role": "user",
-            "content": [
-                {"type": "text", "text": prompt},
-                {
-                    "type": "image_url",
-                    "image_url": {"url": f"data:{mime_type};base64,{image_b64}"},
-                },
-            ],
-        }
+
+async def generate_text_async(
+    prompt: str,
+    system_prompt: str | None = None,
+    max_tokens: int = 2048,
+    temperature: float = 0.2,
+    json_schema: dict | None = None,
+    retry_max_tokens: int | None = None,
+) -> str:
+    """Async variant of generate_text() for overlapping independent calls.
+
+    Args:
+        prompt: The user message / clinical question.
+        system_prompt: Optional system message for role setting.
+        max_tokens: Maximum completion tokens.
+        temperature: Sampling temperature.
+        json_schema: Optional JSON schema the response must conform to.
+        retry_max_tokens: If the reply stops at ``max_tokens`` (finish
+            reason ``"length"``), reissue it once with this larger budget.
+
+    Returns:
+        The model's text response.
+
+    Raises:
+        openai.APIError: On API failures.
+        EnvironmentError: On missing configuration.
+    """
+    logger.info(
+        "\033[35m\U0001f680 MedGemma 27B async API call — "
+        "prompt=%d chars, max_tokens=%d, temp=%.2f\033[0m",
+        len(prompt),
+        max_tokens,
+        temperature,
     )
+    async with _make_async_client("MEDGEMMA_27B_BASE_URL") as client:
+        return await _create_text(
+            client,
+            prompt,
+            system_prompt,
+            max_tokens,
+            temperature,
+            json_schema,
+            retry_max_tokens,
+        )
 
-    response = client.chat.completions.create(
-        model=_MEDGEMMA_4B_MODEL,
-        messages=messages,
-        max_tokens=max_tokens,
-        temperature=temperature,
+
+async def generate_text_batch(
+    prompts: list[str],
+    system_prompt: str | None = None,
+    max_tokens: int = 2048,
+    temperature: float = 0.2,
+    json_schema: dict | None = None,
+    retry_max_tokens: int | None = None,
+) -> list[str | Exception]:
+    """Send several prompts to MedGemma 27B concurrently over one client.
+
+    Up to MAX_BATCH_CONCURRENCY requests are in flight together, so the
+    endpoint can batch them instead of serving one prompt at a time.
+
+    Args:
+        prompts: User messages, one per request.
+        system_prompt: Optional system message shared by every request.
+        max_tokens: Maximum completion tokens per request.
+        temperature: Sampling temperature.
+        json_schema: Optional JSON schema every response must conform to.
+        retry_max_tokens: If a reply stops at ``max_tokens`` (finish reason
+            ``"length"``), reissue that prompt once with this larger budget.
+
+    Returns:
+        One entry per prompt, in order: the model's text response, or the
+        exception raised by that request so one failure does not discard
+        the others.
+
+    Raises:
+        EnvironmentError: On missing configuration.
+    """
+    logger.info(
+        "\033[35m\U0001f680 MedGemma 27B batch API call — "
+        "%d prompts, max_tokens=%d, temp=%.2f\033[0m",
+        len(prompts),
+        max_tokens,
+        temperature,
     )
-    return response.choices[0].message.content
+    # Keep in flight only what the server batches together; the rest queue
+    # here instead of timing out in the endpoint's request queue
+    slots = asyncio.Semaphore(MAX_BATCH_CONCURRENCY)
+
+    async def _one(client: AsyncOpenAI, prompt: str) -> str:
+        async with slots:
+            return await _create_text(
+                client,
+                prompt,
+                system_prompt,
+                max_tokens,
+                temperature,
+                json_schema,
+                retry_max_tokens,
+            )
+
+    async with _make_async_client("MEDGEMMA_27B_BASE_URL") as client:
+        return await asyncio.gather(
+            *(_one(client, prompt) for prompt in prompts),
+            return_exceptions=True,
+        )
+
+
+async def analyze_image_async(
+    image: bytes,
+    prompt: str,
+    system_prompt: str | None = None,
+    mime_type: str = "image/jpeg",
+    max_tokens: int = 2048,
+    temperature: float = 0.2,
+    json_schema: dict | None = None,
+    retry_max_tokens: int | None = None,
+) -> str:
+    """Async variant of analyze_image() for overlapping independent calls.
+
+    Args:
+        image: Raw image bytes (JPEG, PNG, etc.).
+        prompt: Text prompt describing what to look for.
+        system_prompt: Optional system message.
+        mime_type: MIME type of the image (default: image/jpeg).
+        max_tokens: Maximum completion tokens.
+        temperature: Sampling temperature.
+        json_schema: Optional JSON schema the response must conform to.
+        retry_max_tokens: If the reply stops at ``max_tokens`` (finish
+            reason ``"length"``), reissue it once with this larger budget.
+
+    Returns:
+        The model's text response describing the image.
+
+    Raises:
+        openai.APIError: On API failures.
+        EnvironmentError: On missing configuration.
+    """
+    async with _make_async_client("MEDGEMMA_4B_BASE_URL") as client:
+        return await _acomplete_with_retry(
+            client,
+            json_schema,
+            max_tokens,
+            retry_max_tokens,
+            model=_MEDGEMMA_4B_MODEL,
+            messages=_image_messages(image, prompt, system_prompt, mime_type),
+            temperature=temperature,
+        )
@@ -1,7 +1,12 @@
 """LangGraph triage pipeline orchestrator.
 
 Connects agents into a coherent pipeline:
-    intake data → image analysis (optional) → triage → documentation
+    intake data → image analysis ∥ triage (optional) → triage → documentation
+
+When an image is supplied, image analysis (MedGemma 4B) and a speculative
+triage (MedGemma 27B) run concurrently. The speculative triage is kept
+unless the image findings could raise the triage color, in which case
+triage re-runs with the findings merged into the patient data.
 
 The intake conversation is driven by the UI/caller. This orchestrator
 receives **completed** patient data and runs the remaining steps.
@@ -19,18 +24,26 @@ Usage:
 """
 
 import base64
+import hashlib
 import json
 import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from typing import Annotated, Optional
 
 import httpx
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import END, StateGraph
 from typing_extensions import TypedDict
 
 from src.agents.documentation import generate_fhir_bundle
-from src.agents.image_reader import ImageFindings
+from src.agents.image_reader import ImageFindings, ImageSeverity
 from src.agents.image_reader import analyze as analyze_image
-from src.agents.triage import PatientData, TriageResult
+from src.agents.triage import TRIAGE_LEVELS, PatientData, TriageColor, TriageResult
 from src.agents.triage import classify as classify_patient
 
 logger = logging.getLogger(__name__)
@@ -94,6 +107,15 @@ def _ensure_triage_result(raw: object) -> Optional[TriageResult]:
     raise TypeError(f"Expected TriageResult or dict, got {type(raw)}")
 
 
+def _ensure_image_findings(raw: object) -> Optional[ImageFindings]:
+    """Coerce a dict (from HTTP/JSON) into an ImageFindings model."""
+    if raw is None or isinstance(raw, ImageFindings):
+        return raw
+    if isinstance(raw, dict):
+        return ImageFindings(**raw)
+    raise TypeError(f"Expected ImageFindings or dict, got {type(raw)}")
+
+
 def _ensure_image_bytes(raw: object) -> Optional[bytes]:
     """Coerce base64 string (from HTTP/JSON) into bytes."""
     if raw is None or isinstance(raw, bytes):
@@ -103,6 +125,179 @@ def _ensure_image_bytes(raw: object) -> Optional[bytes]:
     raise TypeError(f"Expected bytes or base64 str, got {type(raw)}")
 
 
+# ---------------------------------------------------------------------------
+# Result caches
+# ---------------------------------------------------------------------------
+
+
+class _LRUCache:
+    """Thread-safe, bounded least-recently-used map. Size 0 disables it.
+
+    Entries older than ``ttl`` seconds are treated as missing, so results
+    do not outlive a model or prompt change by more than ``ttl``.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, object]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[object]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: object) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+# Exact-match only: two patients share a cached result only when every
+# field, vitals included, is identical. Set to 0 to disable.
+TRIAGE_CACHE_SIZE = int(os.environ.get("TRIAGE_CACHE_SIZE", "256"))
+TRIAGE_CACHE_TTL = float(os.environ.get("TRIAGE_CACHE_TTL", "3600"))
+
+# Results below this confidence are not cached, so a retry can do better.
+_CACHE_MIN_CONFIDENCE = 0.8
+
+_TRIAGE_CACHE = _LRUCache(TRIAGE_CACHE_SIZE, TRIAGE_CACHE_TTL)
+
+# Image findings keyed by image content, MIME type and clinical context.
+# Set to 0 to disable.
+IMAGE_CACHE_SIZE = int(os.environ.get("IMAGE_CACHE_SIZE", "64"))
+IMAGE_CACHE_TTL = float(os.environ.get("IMAGE_CACHE_TTL", "3600"))
+
+_IMAGE_CACHE = _LRUCache(IMAGE_CACHE_SIZE, IMAGE_CACHE_TTL)
+
+
+def _triage_cache_key(patient_data: PatientData, lang: str) -> str:
+    """Return a digest of the canonical patient JSON and language."""
+    payload = f"{lang}\n{patient_data.model_dump_json()}"
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _image_cache_key(image_bytes: bytes, mime_type: str, context: str) -> str:
+    """Return a BLAKE2b digest of the image and the prompt inputs."""
+    digest = hashlib.blake2b(image_bytes, digest_size=32)
+    digest.update(f"\n{mime_type}\n{context}".encode())
+    return digest.hexdigest()
+
+
+def _cached_classify(
+    patient_data: PatientData,
+    lang: str,
+    on_delta: Optional[Callable[[str], None]] = None,
+) -> TriageResult:
+    """Classify a patient, reusing the result for an identical prior input.
+
+    The cache holds its own copy and hands out copies, so a caller that
+    edits its result cannot change what the next patient receives.
+    """
+    key = _triage_cache_key(patient_data, lang)
+    cached = _TRIAGE_CACHE.get(key)
+    if cached is not None:
+        logger.info("Triage cache hit")
+        return cached.model_copy(deep=True)
+
+    result = classify_patient(patient_data, lang=lang, on_delta=on_delta)
+    if not result.parse_failed and result.confidence >= _CACHE_MIN_CONFIDENCE:
+        _TRIAGE_CACHE.put(key, result.model_copy(deep=True))
+    return result
+
+
+def _cached_analyze_image(
+    image_bytes: bytes, mime_type: str, clinical_context: str
+) -> ImageFindings:
+    """Analyze an image, reusing findings for the same image and context.
+
+    Copies go in and out of the cache, as in _cached_classify().
+    """
+    key = _image_cache_key(image_bytes, mime_type, clinical_context)
+    cached = _IMAGE_CACHE.get(key)
+    if cached is not None:
+        logger.info("Image analysis cache hit")
+        return cached.model_copy(deep=True)
+
+    findings = analyze_image(
+        image_bytes=image_bytes,
+        mime_type=mime_type,
+        clinical_context=clinical_context,
+    )
+    if not findings.parse_failed:
+        _IMAGE_CACHE.put(key, findings.model_copy(deep=True))
+    return findings
+
+
+# ---------------------------------------------------------------------------
+# Rule-based RED criteria
+# ---------------------------------------------------------------------------
+
+# Hard limits that make a patient RED regardless of the rest of the picture.
+# They only ever escalate, so a match can skip the model call safely.
+_RED_SPO2_BELOW = 85.0
+_RED_HR_ABOVE = 180
+_RED_HR_BELOW = 40
+_RED_RR_ABOVE = 35
+
+_RULE_REASONING: dict[str, str] = {
+    "en": "Rule-based RED: critical finding(s) meet a hard emergency criterion.",
+    "pt": "Classificação VERMELHA por regra: achado(s) crítico(s) atendem a "
+    "um critério de emergência absoluto.",
+}
+
+
+def _check_red_criteria(
+    patient_data: PatientData, image_findings: Optional[ImageFindings]
+) -> list[str]:
+    """Return the hard RED criteria the patient meets (empty if none)."""
+    matched: list[str] = []
+    vs = patient_data.vital_signs
+    # A vital sign of 0 means "not provided", as in the form and FHIR builder
+    if vs is not None:
+        if vs.spo2 and vs.spo2 < _RED_SPO2_BELOW:
+            matched.append(f"SpO2 {vs.spo2}% < {_RED_SPO2_BELOW:g}%")
+        if vs.heart_rate and vs.heart_rate > _RED_HR_ABOVE:
+            matched.append(f"HR {vs.heart_rate} bpm > {_RED_HR_ABOVE}")
+        if vs.heart_rate and vs.heart_rate < _RED_HR_BELOW:
+            matched.append(f"HR {vs.heart_rate} bpm < {_RED_HR_BELOW}")
+        if vs.respiratory_rate and vs.respiratory_rate > _RED_RR_ABOVE:
+            matched.append(f"RR {vs.respiratory_rate}/min > {_RED_RR_ABOVE}")
+    if image_findings is not None and image_findings.severity is ImageSeverity.CRITICAL:
+        matched.append("Image severity CRITICAL")
+    return matched
+
+
+def _rule_based_red(criteria: list[str], lang: str) -> TriageResult:
+    """Build the deterministic RED result for matched hard criteria."""
+    level_name, max_wait = TRIAGE_LEVELS[TriageColor.RED]
+    return TriageResult(
+        triage_color=TriageColor.RED,
+        triage_level=level_name,
+        max_wait_minutes=max_wait,
+        reasoning=_RULE_REASONING.get(lang, _RULE_REASONING["pt"]),
+        key_discriminators=criteria,
+        confidence=1.0,
+        raw_model_response="",
+    )
+
+
 # ---------------------------------------------------------------------------
 # Node functions
 # ---------------------------------------------------------------------------
@@ -118,10 +313,8 @@ def run_image_analysis(state: PipelineState) -> dict:
     patient_data = _ensure_patient_data(state["patient_data"])
 
     try:
-        findings = analyze_image(
-            image_bytes=image_bytes,
-            mime_type=mime_type,
-            clinical_context=patient_data.chief_complaint,
+        findings = _cached_analyze_image(
+            image_bytes, mime_type, patient_data.chief_complaint
         )
         # Wire image findings into patient data for triage
         updated_patient = patient_data.model_copy(
@@ -137,14 +330,34 @@ def run_image_analysis(state: PipelineState) -> dict:
         return {"errors": [f"Image analysis failed: {exc}"]}
 
 
-def run_triage(state: PipelineState) -> dict:
-    """Classify patient using Manchester Protocol via MedGemma 27B."""
+def _triage_delta_callback(
+    config: Optional[RunnableConfig],
+) -> Optional[Callable[[str], None]]:
+    """Return the streaming callback passed to run_pipeline, if any."""
+    if not config:
+        return None
+    return config.get("configurable", {}).get("on_triage_delta")
+
+
+def run_triage(state: PipelineState, config: Optional[RunnableConfig] = None) -> dict:
+    """Classify patient using Manchester Protocol via MedGemma 27B.
+
+    Patients meeting a hard RED criterion (critical vitals or a CRITICAL
+    image) are classified RED by rule without calling the model.
+    """
     patient_data = _ensure_patient_data(state["patient_data"])
 
     lang = state.get("lang", "pt")
 
+    criteria = _check_red_criteria(
+        patient_data, _ensure_image_findings(state.get("image_findings"))
+    )
+    if criteria:
+        logger.info("Triage short-circuited to RED by rule: %s", criteria)
+        return {"triage_result": _rule_based_red(criteria, lang)}
+
     try:
-        result = classify_patient(patient_data, lang=lang)
+        result = _cached_classify(patient_data, lang, _triage_delta_callback(config))
         logger.info(
             "Triage complete: color=%s, confidence=%.2f",
             result.triage_color.value,
@@ -156,6 +369,61 @@ def run_triage(state: PipelineState) -> dict:
         return {"errors": [f"Triage classification failed: {exc}"]}
 
 
+# Least urgent triage color consistent with each image severity. A
+# speculative triage at or above this urgency cannot be raised by the image.
+_IMAGE_SEVERITY_FLOOR: dict[ImageSeverity, TriageColor] = {
+    ImageSeverity.CRITICAL: TriageColor.RED,
+    ImageSeverity.SEVERE: TriageColor.ORANGE,
+    ImageSeverity.MODERATE: TriageColor.YELLOW,
+    ImageSeverity.MILD: TriageColor.GREEN,
+    ImageSeverity.NORMAL: TriageColor.BLUE,
+}
+
+
+def _image_may_raise_color(findings: ImageFindings, triage: TriageResult) -> bool:
+    """Return True if image findings are more urgent than the triage color."""
+    floor = _IMAGE_SEVERITY_FLOOR[findings.severity]
+    return TRIAGE_LEVELS[floor][1] < TRIAGE_LEVELS[triage.triage_color][1]
+
+
+def run_parallel_analysis(
+    state: PipelineState, config: Optional[RunnableConfig] = None
+) -> dict:
+    """Run image analysis and a speculative triage concurrently.
+
+    The speculative triage sees the patient data without image findings.
+    Its result is kept only when the image cannot raise the triage color;
+    otherwise ``triage_result`` is left unset so that ``run_triage``
+    re-classifies with the findings merged in.
+
+    The speculative call is not streamed to ``on_triage_delta``: it may be
+    discarded, and the caller should only see text from the result it gets.
+    """
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        image_future = pool.submit(run_image_analysis, state)
+        triage_future = pool.submit(run_triage, state)
+        image_update = image_future.result()
+        triage_update = triage_future.result()
+
+    # A failed speculative triage is retried by run_triage, which records
+    # the error if it fails again.
+    update = dict(image_update)
+    triage = triage_update.get("triage_result")
+    findings = image_update.get("image_findings")
+    if triage is None:
+        return update
+    if findings is not None and _image_may_raise_color(findings, triage):
+        logger.info(
+            "Image severity %s may raise triage color %s, re-running triage",
+            findings.severity.value,
+            triage.triage_color.value,
+        )
+        return update
+
+    update["triage_result"] = triage
+    return update
+
+
 def run_documentation(state: PipelineState) -> dict:
     """Generate FHIR R4 Bundle from triage results."""
     triage_result = _ensure_triage_result(state.get("triage_result"))
@@ -190,7 +458,14 @@ def run_documentation(state: PipelineState) -> dict:
 def _should_analyze_image(state: PipelineState) -> str:
     """Route to image analysis if image bytes are present."""
     if state.get("image_bytes"):
-        return "run_image_analysis"
+        return "run_parallel_analysis"
+    return "run_triage"
+
+
+def _needs_triage(state: PipelineState) -> str:
+    """Route to triage unless a speculative triage result was kept."""
+    if state.get("triage_result"):
+        return "run_documentation"
     return "run_triage"
 
 
@@ -204,7 +479,7 @@ def build_graph() -> StateGraph:
     graph = StateGraph(PipelineState)
 
     # Add nodes
-    graph.add_node("run_image_analysis", run_image_analysis)
+    graph.add_node("run_parallel_analysis", run_parallel_analysis)
     graph.add_node("run_triage", run_triage)
     graph.add_node("run_documentation", run_documentation)
 
@@ -212,13 +487,20 @@ def build_graph() -> StateGraph:
     graph.set_conditional_entry_point(
         _should_analyze_image,
         {
-            "run_image_analysis": "run_image_analysis",
+            "run_parallel_analysis": "run_parallel_analysis",
             "run_triage": "run_triage",
         },
     )
 
     # Edges
-    graph.add_edge("run_image_analysis", "run_triage")
+    graph.add_conditional_edges(
+        "run_parallel_analysis",
+        _needs_triage,
+        {
+            "run_triage": "run_triage",
+            "run_documentation": "run_documentation",
+        },
+    )
     graph.add_edge("run_triage", "run_documentation")
     graph.add_edge("run_documentation", END)
 
@@ -337,6 +619,7 @@ def run_pipeline(
     patient_age: Optional[int] = None,
     patient_sex: Optional[str] = None,
     use_langgraph_studio: bool = False,
+    on_triage_delta: Optional[Callable[[str], None]] = None,
 ) -> PipelineState:
     """Run the full triage pipeline.
 
@@ -351,6 +634,10 @@ def run_pipeline(
         use_langgraph_studio: When True, invoke the graph via the
             LangGraph dev server HTTP API so the run is visible in
             LangGraph Studio. Requires ``langgraph dev`` to be running.
+        on_triage_delta: Called with each chunk of the triage model's
+            streamed JSON reply, so a UI can show the reasoning as it is
+            generated. Not called for cached or rule-based results, or
+            when running through Studio.
 
     Returns:
         PipelineState with triage_result, image_findings (if any),
@@ -388,7 +675,59 @@ def run_pipeline(
             "patient_sex": patient_sex,
             "errors": [],
         }
-        result = _compiled_graph.invoke(initial_state)
+        result = _compiled_graph.invoke(
+            initial_state,
+            config={"configurable": {"on_triage_delta": on_triage_delta}},
+        )
+
+    logger.info(
+        "Pipeline complete. Errors: %d",
+        len(result.get("errors", [])),
+    )
+    return result
+
+
+async def run_pipeline_async(
+    patient_data: PatientData,
+    image_bytes: Optional[bytes] = None,
+    image_mime_type: str = "image/jpeg",
+    lang: str = "pt",
+    patient_name: str = "Paciente",
+    patient_age: Optional[int] = None,
+    patient_sex: Optional[str] = None,
+) -> PipelineState:
+    """Async variant of :func:`run_pipeline` for use inside an event loop.
+
+    Runs the local graph via ``ainvoke``; LangGraph Studio is not supported.
+
+    Args:
+        patient_data: Structured patient data (from intake or form).
+        image_bytes: Optional raw image bytes for analysis.
+        image_mime_type: MIME type of the image.
+        lang: Language code (``"pt"`` or ``"en"``).
+        patient_name: Display name for FHIR output.
+        patient_age: Age in years for FHIR output.
+        patient_sex: ``"M"`` or ``"F"`` for FHIR output.
+
+    Returns:
+        PipelineState with triage_result, image_findings (if any),
+        fhir_bundle, and any errors.
+    """
+    logger.info(
+        "Starting async triage pipeline (image=%s)",
+        "yes" if image_bytes else "no",
+    )
+    initial_state: PipelineState = {
+        "patient_data": patient_data,
+        "image_bytes": image_bytes,
+        "image_mime_type": image_mime_type,
+        "lang": lang,
+        "patient_name": patient_name,
+        "patient_age": patient_age,
+        "patient_sex": patient_sex,
+        "errors": [],
+    }
+    result = await _compiled_graph.ainvoke(initial_state)
 
     logger.info(
         "Pipeline complete. Errors: %d",
@@ -6,6 +6,7 @@ Usage:
 
 import json
 import logging
+import re
 import time
 from pathlib import Path
 from typing import Optional
@@ -19,7 +20,6 @@ from src.agents.triage import (
     TriageResult,
     VitalSigns,
 )
-from src.pipeline.orchestrator import run_pipeline
 from src.ui.strings import get_strings
 
 logger = logging.getLogger(__name__)
@@ -37,18 +37,15 @@ logging.basicConfig(
 _CASES_DIR = Path("data/sample_cases")
 
 
-def _load_test_cases(lang: str = "pt") -> list[dict]:
-    """Load JSON test cases filtered by language."""
-    cases: list[dict] = []
+def _load_test_cases() -> dict[str, list[dict]]:
+    """Load JSON test cases in one pass, bucketed by language."""
+    cases: dict[str, list[dict]] = {}
     for path in sorted(_CASES_DIR.glob("case_*.json")):
         try:
-            with open(path) as f:
-                raw = json.load(f)
+            raw = json.loads(path.read_bytes())
         except (OSError, json.JSONDecodeError):
             logger.warning("Failed to load test case %s, skipping", path, exc_info=True)
             continue
-        if raw.get("lang", "en") != lang:
-            continue
         p = raw["patient"]
         vs = p.get("vital_signs", {})
         flat = {
@@ -72,10 +69,33 @@ def _load_test_cases(lang: str = "pt") -> list[dict]:
             "_test_case_id": raw.get("id", ""),
             "_test_case_title": raw.get("title", ""),
         }
-        cases.append(flat)
+        cases.setdefault(raw.get("lang", "en"), []).append(flat)
     return cases
 
 
+def _cases_fingerprint() -> tuple[tuple[str, int], ...]:
+    """Name and mtime of each case file; changes when a case is edited."""
+    return tuple(
+        sorted((p.name, p.stat().st_mtime_ns) for p in _CASES_DIR.glob("case_*.json"))
+    )
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _test_cases_by_label(
+    fingerprint: tuple[tuple[str, int], ...],
+) -> dict[str, dict[str, dict]]:
+    """Map each language to its sidebar labels and test cases.
+
+    ``fingerprint`` is only part of the cache key, so edited or added case
+    files are picked up without restarting Streamlit. The mapping is shared,
+    not copied, across sessions: callers must treat it as read-only.
+    """
+    return {
+        lang: {f"{tc['_test_case_id']}: {tc['name']}": tc for tc in cases}
+        for lang, cases in _load_test_cases().items()
+    }
+
+
 # ---------------------------------------------------------------------------
 # Color display config
 # ---------------------------------------------------------------------------
@@ -88,6 +108,34 @@ _COLOR_MAP: dict[TriageColor, dict[str, str]] = {
     TriageColor.BLUE: {"bg": "#2563EB", "fg": "#FFFFFF", "emoji": "\U0001f535"},
 }
 
+
+def _banner_template(color: TriageColor) -> str:
+    """Return the color banner HTML with ``{level}``/``{max_wait_label}`` slots."""
+    colors = _COLOR_MAP[color]
+    _, max_wait = TRIAGE_LEVELS[color]
+    return f"""
+        <div style="
+            background-color: {colors['bg']};
+            color: {colors['fg']};
+            padding: 1.5rem;
+            border-radius: 0.75rem;
+            text-align: center;
+            margin-bottom: 1rem;
+        ">
+            <h1 style="margin: 0; color: {colors['fg']};">
+                {colors['emoji']} {{level}}
+            </h1>
+            <p style="margin: 0.5rem 0 0 0; font-size: 1.2rem;">
+                {{max_wait_label}}: <strong>{max_wait} min</strong>
+            </p>
+        </div>
+        """
+
+
+_BANNER_TEMPLATES: dict[TriageColor, str] = {
+    color: _banner_template(color) for color in TriageColor
+}
+
 _LEVEL_KEYS: dict[TriageColor, str] = {
     TriageColor.RED: "level_red",
     TriageColor.ORANGE: "level_orange",
@@ -111,78 +159,18 @@ st.set_page_config(
 # Custom CSS to match Intellidoctor brand palette
 # ---------------------------------------------------------------------------
 
-st.markdown(
-    """
-    <style>
-    /* Sidebar */
-    [data-testid="stSidebar"] {
-        background-color: #27273F;
-    }
-    [data-testid="stSidebar"] * {
-        color: #E8E5F0 !important;
-    }
-    [data-testid="stSidebar"] .stSelectbox label,
-    [data-testid="stSidebar"] .stButton button {
-        color: #E8E5F0 !important;
-    }
-    /* Sidebar dropdown — dark background with visible text */
-    [data-testid="stSidebar"] [data-baseweb="select"],
-    [data-testid="stSidebar"] [data-baseweb="select"] > div,
-    [data-testid="stSidebar"] [data-baseweb="select"] > div > div,
-    [data-testid="stSidebar"] [data-baseweb="select"] input {
-        background-color: #3A3A55 !important;
-        color: #E8E5F0 !important;
-    }
-    [data-testid="stSidebar"] [data-baseweb="select"] * {
-        color: #E8E5F0 !important;
-    }
-    [data-testid="stSidebar"] [data-baseweb="select"] svg {
-        fill: #E8E5F0 !important;
-    }
-    /* Sidebar button — outlined style with visible text */
-    [data-testid="stSidebar"] .stButton > button {
-        background-color: transparent;
-        border: 1px solid #8776F6;
-        color: #E8E5F0 !important;
-    }
-    [data-testid="stSidebar"] .stButton > button:hover {
-        background-color: #8776F6;
-        color: #FFFFFF !important;
-    }
-    [data-testid="stSidebar"] hr {
-        border-color: #4A4660;
-    }
+_STYLES_PATH = Path(__file__).with_name("styles.css")
 
-    /* Primary button (Classificar Paciente) */
-    .stButton > button[kind="primary"],
-    .stFormSubmitButton > button {
-        background-color: #8776F6;
-        border-color: #8776F6;
-        color: #FFFFFF !important;
-    }
-    .stFormSubmitButton > button:hover {
-        background-color: #7565E0;
-        border-color: #7565E0;
-    }
 
-    /* Expander headers */
-    .streamlit-expanderHeader {
-        color: #2D2B3D;
-    }
+@st.cache_resource(show_spinner=False)
+def _load_css() -> str:
+    """Read the dashboard stylesheet once per process."""
+    return _STYLES_PATH.read_text(encoding="utf-8")
 
-    /* Progress bar */
-    .stProgress > div > div > div > div {
-        background-color: #8776F6;
-    }
 
-    /* Subheader accent */
-    h2, h3 {
-        color: #2D2B3D !important;
-    }
-    </style>
-    """,
-    unsafe_allow_html=True,
-)
+# Must be emitted on every run: Streamlit drops elements a rerun does not
+# re-emit. st.html skips the markdown renderer that st.markdown would use.
+st.html(f"<style>{_load_css()}</style>")
 
 
 # ---------------------------------------------------------------------------
@@ -194,6 +182,7 @@ def _init_session_state() -> None:
     defaults: dict[str, object] = {
         "triage_result": None,
         "fhir_bundle": None,
+        "fhir_json": None,
         "image_findings": None,
         "selected_case": None,
         "lang": "pt",
@@ -211,22 +200,39 @@ _init_session_state()
 # ---------------------------------------------------------------------------
 
 
+# Widget callbacks run before the rerun their widget triggers, so state
+# changed here is seen by the whole run without an extra st.rerun().
+
+
+def _on_lang_change() -> None:
+    """Switch the UI language and drop the case chosen in the old one."""
+    selected = st.session_state["lang_selector"]
+    st.session_state["lang"] = "pt" if selected == "Português" else "en"
+    st.session_state["selected_case"] = None
+
+
+def _on_clear(placeholder: str) -> None:
+    """Reset the selected case and results; widgets are not yet drawn."""
+    st.session_state["selected_case"] = None
+    st.session_state["triage_result"] = None
+    st.session_state["fhir_bundle"] = None
+    st.session_state["fhir_json"] = None
+    st.session_state["image_findings"] = None
+    st.session_state["test_case_selector"] = placeholder
+
+
 def _render_sidebar(s: dict[str, str], lang: str) -> None:
     with st.sidebar:
         # Language selector — always first
         lang_options = ["Português", "English"]
         lang_index = 0 if lang == "pt" else 1
-        selected_lang = st.selectbox(
+        st.selectbox(
             s["language_label"],
             lang_options,
             index=lang_index,
             key="lang_selector",
+            on_change=_on_lang_change,
         )
-        new_lang = "pt" if selected_lang == "Português" else "en"
-        if new_lang != st.session_state["lang"]:
-            st.session_state["lang"] = new_lang
-            st.session_state["selected_case"] = None
-            st.rerun()
 
         st.divider()
 
@@ -235,18 +241,11 @@ def _render_sidebar(s: dict[str, str], lang: str) -> None:
             unsafe_allow_html=True,
         )
 
-        # Handle pending resets before widgets are instantiated
-        if st.session_state.get("_pending_clear"):
-            st.session_state["test_case_selector"] = s["sidebar_select_placeholder"]
-            st.session_state["_pending_clear"] = False
-
         # Test cases (real MedGemma)
         st.divider()
         st.header(s["sidebar_test_cases"])
-        test_cases = _load_test_cases(lang)
-        test_names = [s["sidebar_select_placeholder"]] + [
-            f"{tc['_test_case_id']}: {tc['name']}" for tc in test_cases
-        ]
+        test_cases = _test_cases_by_label(_cases_fingerprint()).get(lang, {})
+        test_names = [s["sidebar_select_placeholder"], *test_cases]
 
         test_selected = st.selectbox(
             s["sidebar_load_test_case"],
@@ -254,40 +253,18 @@ def _render_sidebar(s: dict[str, str], lang: str) -> None:
             key="test_case_selector",
         )
 
-        if test_selected != s["sidebar_select_placeholder"]:
-            for tc in test_cases:
-                label = f"{tc['_test_case_id']}: {tc['name']}"
-                if label == test_selected:
-                    st.session_state["selected_case"] = tc
-                    break
-        else:
-            st.session_state["selected_case"] = None
+        st.session_state["selected_case"] = test_cases.get(test_selected)
 
         st.divider()
-        if st.button(s["sidebar_clear"]):
-            st.session_state["selected_case"] = None
-            st.session_state["triage_result"] = None
-            st.session_state["fhir_bundle"] = None
-            st.session_state["image_findings"] = None
-            st.session_state["_pending_clear"] = True
-            st.rerun()
+        st.button(
+            s["sidebar_clear"],
+            on_click=_on_clear,
+            args=(s["sidebar_select_placeholder"],),
+        )
 
         st.divider()
-        st.caption(s["sidebar_disclaimer"])
-        st.caption(s["sidebar_synthetic"])
-
-
-# ---------------------------------------------------------------------------
-# Helper to get case default
-# ---------------------------------------------------------------------------
-
-
-def _case_val(field: str, default: object = "") -> object:
-    """Return field value from selected sample case, or default."""
-    case = st.session_state.get("selected_case")
-    if case is not None and field in case:
-        return case[field]
-    return default
+        # One caption element, two paragraphs
+        st.caption(f"{s['sidebar_disclaimer']}\n\n{s['sidebar_synthetic']}")
 
 
 # ---------------------------------------------------------------------------
@@ -298,22 +275,24 @@ def _case_val(field: str, default: object = "") -> object:
 def _render_intake_form(s: dict[str, str]) -> Optional[dict]:
     """Render the patient intake form. Returns form data dict on submit."""
     st.subheader(s["patient_data"])
+    # Selected test case supplies the field defaults
+    case: dict = st.session_state.get("selected_case") or {}
 
     with st.form("intake_form"):
         col_name, col_age, col_sex = st.columns([3, 1, 1])
         with col_name:
-            name = st.text_input(s["patient_name"], value=_case_val("name"))
+            name = st.text_input(s["patient_name"], value=case.get("name", ""))
         with col_age:
             age = st.number_input(
                 s["age"],
                 min_value=0,
                 max_value=120,
-                value=int(_case_val("age", 0)),
+                value=int(case.get("age", 0)),
                 step=1,
             )
         with col_sex:
             sex_options = ["M", "F"]
-            sex_default = _case_val("sex", "M")
+            sex_default = case.get("sex", "M")
             sex_idx = (
                 sex_options.index(sex_default) if sex_default in sex_options else 0
             )
@@ -321,27 +300,27 @@ def _render_intake_form(s: dict[str, str]) -> Optional[dict]:
 
         chief_complaint = st.text_area(
             s["chief_complaint"],
-            value=_case_val("chief_complaint"),
+            value=case.get("chief_complaint", ""),
             height=68,
         )
 
         symptoms_str = st.text_input(
             s["symptoms"],
-            value=_case_val("symptoms"),
+            value=case.get("symptoms", ""),
         )
 
         col_onset, col_pain = st.columns(2)
         with col_onset:
             onset = st.text_input(
                 s["onset"],
-                value=_case_val("onset"),
+                value=case.get("onset", ""),
             )
         with col_pain:
             pain_scale = st.slider(
                 s["pain_scale"],
                 min_value=0,
                 max_value=10,
-                value=int(_case_val("pain_scale", 0)),
+                value=int(case.get("pain_scale", 0)),
             )
 
         with st.expander(s["vital_signs"]):
@@ -351,26 +330,26 @@ def _render_intake_form(s: dict[str, str]) -> Optional[dict]:
                     s["heart_rate"],
                     min_value=0,
                     max_value=300,
-                    value=int(_case_val("heart_rate", 0)),
+                    value=int(case.get("heart_rate", 0)),
                     step=1,
                 )
                 blood_pressure = st.text_input(
                     s["blood_pressure"],
-                    value=_case_val("blood_pressure"),
+                    value=case.get("blood_pressure", ""),
                 )
             with vs_c2:
                 respiratory_rate = st.number_input(
                     s["respiratory_rate"],
                     min_value=0,
                     max_value=60,
-                    value=int(_case_val("respiratory_rate", 0)),
+                    value=int(case.get("respiratory_rate", 0)),
                     step=1,
                 )
                 temperature = st.number_input(
                     s["temperature"],
                     min_value=0.0,
                     max_value=45.0,
-                    value=float(_case_val("temperature", 0.0)),
+                    value=float(case.get("temperature", 0.0)),
                     step=0.1,
                     format="%.1f",
                 )
@@ -379,7 +358,7 @@ def _render_intake_form(s: dict[str, str]) -> Optional[dict]:
                     s["spo2"],
                     min_value=0.0,
                     max_value=100.0,
-                    value=float(_case_val("spo2", 0.0)),
+                    value=float(case.get("spo2", 0.0)),
                     step=0.1,
                     format="%.1f",
                 )
@@ -387,7 +366,7 @@ def _render_intake_form(s: dict[str, str]) -> Optional[dict]:
                     s["glucose"],
                     min_value=0.0,
                     max_value=600.0,
-                    value=float(_case_val("glucose", 0.0)),
+                    value=float(case.get("glucose", 0.0)),
                     step=1.0,
                     format="%.0f",
                 )
@@ -395,19 +374,19 @@ def _render_intake_form(s: dict[str, str]) -> Optional[dict]:
         with st.expander(s["history_section"]):
             history_str = st.text_input(
                 s["history"],
-                value=_case_val("history"),
+                value=case.get("history", ""),
             )
             medications_str = st.text_input(
                 s["medications"],
-                value=_case_val("medications"),
+                value=case.get("medications", ""),
             )
             allergies_str = st.text_input(
                 s["allergies"],
-                value=_case_val("allergies"),
+                value=case.get("allergies", ""),
             )
             notes = st.text_area(
                 s["notes"],
-                value=_case_val("notes"),
+                value=case.get("notes", ""),
                 height=68,
             )
 
@@ -446,6 +425,8 @@ def _render_intake_form(s: dict[str, str]) -> Optional[dict]:
 # ---------------------------------------------------------------------------
 
 
+# A fragment: uploading or removing an image reruns only this section
+@st.fragment
 def _render_image_upload(s: dict[str, str]) -> None:
     st.subheader(s["image_upload_header"])
     uploaded = st.file_uploader(
@@ -473,38 +454,58 @@ def _split_csv(text: str) -> Optional[list[str]]:
     return items if items else None
 
 
+_VITAL_FIELDS = (
+    "heart_rate",
+    "blood_pressure",
+    "respiratory_rate",
+    "temperature",
+    "spo2",
+    "glucose",
+)
+_OPTIONAL_FIELDS = ("onset", "pain_scale", "age", "notes")
+_LIST_FIELDS = ("symptoms", "history", "medications", "allergies")
+
+
 def _build_patient_data(form: dict) -> PatientData:
     """Convert form dict into PatientData model."""
-    vital_signs = VitalSigns(
-        heart_rate=form["heart_rate"] if form["heart_rate"] > 0 else None,
-        blood_pressure=form["blood_pressure"] if form["blood_pressure"] else None,
-        respiratory_rate=(
-            form["respiratory_rate"] if form["respiratory_rate"] > 0 else None
-        ),
-        temperature=form["temperature"] if form["temperature"] > 0.0 else None,
-        spo2=form["spo2"] if form["spo2"] > 0.0 else None,
-        glucose=form["glucose"] if form["glucose"] > 0.0 else None,
-    )
-
-    # Only include vital_signs if at least one field is set
-    has_vitals = any(v is not None for v in vital_signs.model_dump().values())
+    # A zero or empty form field means "not provided"; omitted fields
+    # default to None
+    vitals = {field: form[field] for field in _VITAL_FIELDS if form[field]}
+    optional = {field: form[field] for field in _OPTIONAL_FIELDS if form[field]}
+    lists = {field: _split_csv(form[f"{field}_str"]) for field in _LIST_FIELDS}
 
     return PatientData(
         chief_complaint=form["chief_complaint"],
-        symptoms=_split_csv(form["symptoms_str"]),
-        onset=form["onset"] if form["onset"] else None,
-        pain_scale=form["pain_scale"] if form["pain_scale"] > 0 else None,
-        vital_signs=vital_signs if has_vitals else None,
-        history=_split_csv(form["history_str"]),
-        medications=_split_csv(form["medications_str"]),
-        allergies=_split_csv(form["allergies_str"]),
-        age=form["age"] if form["age"] > 0 else None,
         sex=form["sex"],
+        vital_signs=VitalSigns(**vitals) if vitals else None,
         image_findings=st.session_state.get("image_findings"),
-        notes=form["notes"] if form["notes"] else None,
+        **optional,
+        **lists,
     )
 
 
+# ---------------------------------------------------------------------------
+# Streaming reasoning preview
+# ---------------------------------------------------------------------------
+
+# The (possibly still open) reasoning string in a partial triage JSON reply
+_REASONING_RE = re.compile(r'"reasoning"\s*:\s*"((?:[^"\\]|\\.)*)')
+# An escape sequence cut off at the end of the stream so far
+_TRAILING_ESCAPE_RE = re.compile(r"\\(u[0-9a-fA-F]{0,3})?$")
+
+
+def _partial_reasoning(streamed: str) -> str:
+    """Extract the reasoning text generated so far from a streamed reply."""
+    match = _REASONING_RE.search(streamed)
+    if not match:
+        return ""
+    fragment = _TRAILING_ESCAPE_RE.sub("", match.group(1))
+    try:
+        return json.loads(f'"{fragment}"')
+    except json.JSONDecodeError:
+        return fragment
+
+
 # ---------------------------------------------------------------------------
 # Triage result display
 # ---------------------------------------------------------------------------
@@ -512,29 +513,13 @@ def _build_patient_data(form: dict) -> PatientData:
 
 def _render_triage_result(result: TriageResult, s: dict[str, str]) -> None:
     """Render the color-coded Manchester triage classification."""
-    colors = _COLOR_MAP[result.triage_color]
     level_name = s[_LEVEL_KEYS[result.triage_color]]
-    _, max_wait = TRIAGE_LEVELS[result.triage_color]
 
     # Color banner
     st.markdown(
-        f"""
-        <div style="
-            background-color: {colors['bg']};
-            color: {colors['fg']};
-            padding: 1.5rem;
-            border-radius: 0.75rem;
-            text-align: center;
-            margin-bottom: 1rem;
-        ">
-            <h1 style="margin: 0; color: {colors['fg']};">
-                {colors['emoji']} {level_name.upper()}
-            </h1>
-            <p style="margin: 0.5rem 0 0 0; font-size: 1.2rem;">
-                {s['max_wait']}: <strong>{max_wait} min</strong>
-            </p>
-        </div>
-        """,
+        _BANNER_TEMPLATES[result.triage_color].format(
+            level=level_name.upper(), max_wait_label=s["max_wait"]
+        ),
         unsafe_allow_html=True,
     )
 
@@ -556,16 +541,22 @@ def _render_triage_result(result: TriageResult, s: dict[str, str]) -> None:
             st.markdown(f"- {disc}")
 
 
-def _render_fhir_output(fhir_bundle: dict, s: dict[str, str]) -> None:
-    """Render the FHIR JSON output with download button."""
+def _render_fhir_output(fhir_json: str, s: dict[str, str]) -> None:
+    """Render the FHIR JSON output with download button.
+
+    ``fhir_json`` is serialized once when the bundle is produced, so
+    Streamlit reruns do not re-serialize it. It is shown as highlighted
+    text rather than through ``st.json``'s interactive tree.
+    """
     with st.expander(s["fhir_bundle"]):
-        st.json(fhir_bundle)
-        fhir_json = json.dumps(fhir_bundle, indent=2, ensure_ascii=False)
+        st.code(fhir_json, language="json")
         st.download_button(
             label=s["download_fhir"],
             data=fhir_json,
             file_name="triage_fhir_bundle.json",
             mime="application/json",
+            # Downloading changes nothing on the page, so skip the rerun
+            on_click="ignore",
         )
 
 
@@ -604,6 +595,9 @@ def main(use_studio: bool = False) -> None:
             if not form_data["chief_complaint"].strip():
                 st.error(s["chief_complaint_required"])
             else:
+                # Deferred so the first page render does not wait on LangGraph
+                from src.pipeline.orchestrator import run_pipeline
+
                 try:
                     patient_data = _build_patient_data(form_data)
                     p_name = form_data["name"] or "Paciente"
@@ -612,8 +606,20 @@ def main(use_studio: bool = False) -> None:
 
                     logger.info(
                         "\033[1;34m\U0001f3e5 Starting LangGraph "
-                        f"triage pipeline (studio={use_studio})...\033[0m"
+                        "triage pipeline (studio=%s)...\033[0m",
+                        use_studio,
                     )
+                    preview = st.empty()
+                    streamed: list[str] = []
+
+                    def _show_triage_delta(delta: str) -> None:
+                        # Only run_triage streams, and LangGraph runs that
+                        # single node on this script thread
+                        streamed.append(delta)
+                        reasoning = _partial_reasoning("".join(streamed))
+                        if reasoning:
+                            preview.info(reasoning)
+
                     t0 = time.time()
                     pipeline_result = run_pipeline(
                         patient_data=patient_data,
@@ -626,7 +632,9 @@ def main(use_studio: bool = False) -> None:
                         patient_age=p_age,
                         patient_sex=p_sex,
                         use_langgraph_studio=use_studio,
+                        on_triage_delta=_show_triage_delta,
                     )
+                    preview.empty()
                     elapsed = time.time() - t0
                     result = pipeline_result.get("triage_result")
                     fhir_bundle = pipeline_result.get("fhir_bundle")
@@ -645,6 +653,11 @@ def main(use_studio: bool = False) -> None:
                         )
                     st.session_state["triage_result"] = result
                     st.session_state["fhir_bundle"] = fhir_bundle
+                    st.session_state["fhir_json"] = (
+                        json.dumps(fhir_bundle, indent=2, ensure_ascii=False)
+                        if fhir_bundle is not None
+                        else None
+                    )
                 except Exception:
                     logger.exception(
                         "\033[1;31m\u274c Error classifying " "patient\033[0m"
@@ -654,12 +667,12 @@ def main(use_studio: bool = False) -> None:
     with col_right:
         st.subheader(s["triage_result_header"])
         result = st.session_state.get("triage_result")
-        fhir_bundle = st.session_state.get("fhir_bundle")
+        fhir_json = st.session_state.get("fhir_json")
 
         if result is not None:
             _render_triage_result(result, s)
-            if fhir_bundle is not None:
-                _render_fhir_output(fhir_bundle, s)
+            if fhir_json is not None:
+                _render_fhir_output(fhir_json, s)
         else:
             st.info(s["result_placeholder"])
 
@@ -9,8 +9,10 @@ To swap to real agents, change the import in app.py:
 """
 
 import logging
+import re
 import uuid
 from datetime import datetime, timezone
+from functools import lru_cache
 from typing import Optional
 
 from src.agents.triage import (
@@ -85,28 +87,34 @@ _BLUE_KEYWORDS: list[str] = [
     "consulta de rotina",
 ]
 
-_CONFIDENCE: dict[TriageColor, float] = {
-    TriageColor.RED: 0.95,
-    TriageColor.ORANGE: 0.90,
-    TriageColor.YELLOW: 0.85,
-    TriageColor.GREEN: 0.88,
-    TriageColor.BLUE: 0.92,
-}
-
-_REASONING_KEYS: dict[TriageColor, str] = {
-    TriageColor.RED: "reasoning_red",
-    TriageColor.ORANGE: "reasoning_orange",
-    TriageColor.YELLOW: "reasoning_yellow",
-    TriageColor.GREEN: "reasoning_green",
-    TriageColor.BLUE: "reasoning_blue",
-}
-
-_DISCRIMINATOR_KEYS: dict[TriageColor, list[str]] = {
-    TriageColor.RED: ["disc_red_1", "disc_red_2", "disc_red_3"],
-    TriageColor.ORANGE: ["disc_orange_1", "disc_orange_2", "disc_orange_3"],
-    TriageColor.YELLOW: ["disc_yellow_1", "disc_yellow_2", "disc_yellow_3"],
-    TriageColor.GREEN: ["disc_green_1", "disc_green_2", "disc_green_3"],
-    TriageColor.BLUE: ["disc_blue_1", "disc_blue_2", "disc_blue_3"],
+# Per-color reasoning string key, discriminator string keys, and confidence,
+# kept in one table so mock_classify needs a single lookup.
+_COLOR_META: dict[TriageColor, tuple[str, tuple[str, ...], float]] = {
+    TriageColor.RED: (
+        "reasoning_red",
+        ("disc_red_1", "disc_red_2", "disc_red_3"),
+        0.95,
+    ),
+    TriageColor.ORANGE: (
+        "reasoning_orange",
+        ("disc_orange_1", "disc_orange_2", "disc_orange_3"),
+        0.90,
+    ),
+    TriageColor.YELLOW: (
+        "reasoning_yellow",
+        ("disc_yellow_1", "disc_yellow_2", "disc_yellow_3"),
+        0.85,
+    ),
+    TriageColor.GREEN: (
+        "reasoning_green",
+        ("disc_green_1", "disc_green_2", "disc_green_3"),
+        0.88,
+    ),
+    TriageColor.BLUE: (
+        "reasoning_blue",
+        ("disc_blue_1", "disc_blue_2", "disc_blue_3"),
+        0.92,
+    ),
 }
 
 
@@ -115,8 +123,13 @@ _DISCRIMINATOR_KEYS: dict[TriageColor, list[str]] = {
 # ---------------------------------------------------------------------------
 
 
+@lru_cache(maxsize=1024)
 def _keyword_color(text: str) -> TriageColor:
-    """Match chief complaint text against keyword lists."""
+    """Match chief complaint text against keyword lists.
+
+    Cached because the demo replays the same sample complaints; the result
+    depends only on the text.
+    """
     lower = text.lower()
 
     for kw in _HIGH_ACUITY_KEYWORDS:
@@ -142,6 +155,16 @@ def _keyword_color(text: str) -> TriageColor:
     return TriageColor.YELLOW  # safe default
 
 
+_SYSTOLIC_RE = re.compile(r"^\s*(\d+)\s*(?:/|$)")
+
+
+@lru_cache(maxsize=256)
+def _parse_systolic(blood_pressure: str) -> Optional[int]:
+    """Return the systolic value of a ``"120/80"`` reading, or None."""
+    match = _SYSTOLIC_RE.match(blood_pressure)
+    return int(match.group(1)) if match else None
+
+
 def _check_vital_red_flags(
     vital_signs: Optional[VitalSigns],
 ) -> Optional[TriageColor]:
@@ -157,16 +180,15 @@ def _check_vital_red_flags(
 
     # Systolic BP < 90 or > 200 -> ORANGE
     if vs.blood_pressure:
-        try:
-            systolic = int(vs.blood_pressure.split("/")[0])
-            if systolic < 90 or systolic > 200:
-                return TriageColor.ORANGE
-        except (ValueError, IndexError):
+        systolic = _parse_systolic(vs.blood_pressure)
+        if systolic is None:
             logger.warning(
                 "Could not parse blood pressure '%s' — "
                 "vital sign red-flag check skipped",
                 vs.blood_pressure,
             )
+        elif systolic < 90 or systolic > 200:
+            return TriageColor.ORANGE
 
     # HR > 120 or < 50 -> at least YELLOW
     if vs.heart_rate is not None and (vs.heart_rate > 120 or vs.heart_rate < 50):
@@ -229,17 +251,15 @@ def mock_classify(patient: PatientData, lang: str = "pt") -> TriageResult:
         color = _more_urgent(vital_upgrade, color)
 
     level_name, max_wait = TRIAGE_LEVELS[color]
-
-    reasoning = s[_REASONING_KEYS[color]]
-    discriminators = [s[k] for k in _DISCRIMINATOR_KEYS[color]]
+    reasoning_key, discriminator_keys, confidence = _COLOR_META[color]
 
     return TriageResult(
         triage_color=color,
         triage_level=level_name,
         max_wait_minutes=max_wait,
-        reasoning=reasoning,
-        key_discriminators=discriminators,
-        confidence=_CONFIDENCE[color],
+        reasoning=s[reasoning_key],
+        key_discriminators=[s[k] for k in discriminator_keys],
+        confidence=confidence,
         raw_model_response=s["mock_raw_response"],
         parse_failed=False,
     )
@@ -308,7 +328,7 @@ def build_mock_fhir_bundle(
     Returns:
         A dict matching FHIR R4 Bundle structure.
     """
-    now = datetime.now(timezone.utc).isoformat()
+    now = datetime.now(timezone.utc)
     patient_id = str(uuid.uuid4())
     encounter_id = str(uuid.uuid4())
     observation_id = str(uuid.uuid4())
@@ -320,7 +340,7 @@ def build_mock_fhir_bundle(
 
     birth_year = ""
     if patient_age is not None:
-        birth_year = str(datetime.now(timezone.utc).year - patient_age)
+        birth_year = str(now.year - patient_age)
 
     level_name, max_wait = TRIAGE_LEVELS[triage_result.triage_color]
 
@@ -364,7 +384,7 @@ def build_mock_fhir_bundle(
         "resourceType": "Bundle",
         "id": str(uuid.uuid4()),
         "type": "collection",
-        "timestamp": now,
+        "timestamp": now.isoformat(),
         "entry": [
             {
                 "resource": {
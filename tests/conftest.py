@@ -1,8 +1,8 @@
 """Project-wide test fixtures.
 
-Auto-patches src.models.medgemma.generate_text and analyze_image for all
-non-integration tests so the full test suite runs without Vertex AI
-credentials or API credits.
+Auto-patches src.models.medgemma.generate_text and analyze_image (and their
+``*_async`` variants), plus generate_text_batch, for all non-integration tests
+so the full test suite runs without Vertex AI credentials or API credits.
 """
 
 import json
@@ -178,6 +178,11 @@ def _mock_generate_text(prompt: str, **kwargs: object) -> str:
     return _DEFAULT_TEXT_RESPONSE
 
 
+def _mock_generate_text_batch(prompts: list[str], **kwargs: object) -> list[str]:
+    """Return one canned response per prompt, as generate_text_batch would."""
+    return [_mock_generate_text(prompt) for prompt in prompts]
+
+
 def _mock_analyze_image(
     image: bytes = b"",
     prompt: str = "",
@@ -210,6 +215,32 @@ _ANALYZE_IMAGE_TARGETS = [
     "src.agents.image_reader._model_analyze_image",
 ]
 
+# Async targets: ``patch`` swaps these coroutine functions for AsyncMocks,
+# which await to the same canned responses as the sync side effects.
+_GENERATE_TEXT_ASYNC_TARGETS = [
+    "src.models.medgemma.generate_text_async",
+    "src.agents.intake.generate_text_async",
+]
+
+_ANALYZE_IMAGE_ASYNC_TARGETS = [
+    "src.models.medgemma.analyze_image_async",
+    "src.agents.image_reader._model_analyze_image_async",
+]
+
+_GENERATE_TEXT_BATCH_TARGETS = [
+    "src.models.medgemma.generate_text_batch",
+    "src.agents.triage.generate_text_batch",
+]
+
+
+@pytest.fixture(autouse=True)
+def _clear_pipeline_caches() -> None:
+    """Start each test with empty pipeline result caches."""
+    from src.pipeline.orchestrator import _IMAGE_CACHE, _TRIAGE_CACHE
+
+    _TRIAGE_CACHE.clear()
+    _IMAGE_CACHE.clear()
+
 
 @pytest.fixture(autouse=True)
 def _mock_medgemma(request: pytest.FixtureRequest) -> object:
@@ -218,13 +249,20 @@ def _mock_medgemma(request: pytest.FixtureRequest) -> object:
         yield
         return
 
-    patches = [
-        patch(target, side_effect=_mock_generate_text)
-        for target in _GENERATE_TEXT_TARGETS
-    ] + [
-        patch(target, side_effect=_mock_analyze_image)
-        for target in _ANALYZE_IMAGE_TARGETS
-    ]
+    patches = (
+        [
+            patch(target, side_effect=_mock_generate_text)
+            for target in _GENERATE_TEXT_TARGETS + _GENERATE_TEXT_ASYNC_TARGETS
+        ]
+        + [
+            patch(target, side_effect=_mock_generate_text_batch)
+            for target in _GENERATE_TEXT_BATCH_TARGETS
+        ]
+        + [
+            patch(target, side_effect=_mock_analyze_image)
+            for target in _ANALYZE_IMAGE_TARGETS + _ANALYZE_IMAGE_ASYNC_TARGETS
+        ]
+    )
 
     for p in patches:
         p.start()
@@ -1,5 +1,6 @@
 """Tests for the medical image analysis agent."""
 
+import asyncio
 import json
 from unittest.mock import patch
 
@@ -11,6 +12,7 @@ from src.agents.image_reader import (
     _build_image_prompt,
     _parse_image_response,
     analyze,
+    analyze_async,
 )
 
 # ---------------------------------------------------------------------------
@@ -181,6 +183,20 @@ class TestParseImageResponse:
         assert result["severity"] == "NORMAL"
         assert result["parse_failed"] is False
 
+    def test_braces_inside_string_values(self) -> None:
+        raw = json.dumps(
+            {
+                "modality": "photo",
+                "description": "Lesion shaped like a } bracket {",
+                "severity": "MILD",
+                "confidence": 0.8,
+            }
+        )
+        result = _parse_image_response(raw)
+        assert result["severity"] == "MILD"
+        assert result["description"] == "Lesion shaped like a } bracket {"
+        assert result["parse_failed"] is False
+
     def test_regex_fallback(self) -> None:
         raw = "The image shows a SEVERE wound requiring immediate attention."
         result = _parse_image_response(raw)
@@ -307,11 +323,44 @@ class TestAnalyze:
 
         mock_model.assert_called_once()  # type: ignore[attr-defined]
         call_kwargs = mock_model.call_args  # type: ignore[attr-defined]
-        assert call_kwargs.kwargs["max_tokens"] == 1024
+        assert call_kwargs.kwargs["max_tokens"] == 384
         assert call_kwargs.kwargs["temperature"] == 0.1
         assert call_kwargs.kwargs["mime_type"] == "image/png"
         assert call_kwargs.kwargs["image"] == sample_image_bytes
 
+    @patch("src.agents.image_reader._model_analyze_image")
+    def test_requests_guided_json_schema(
+        self,
+        mock_model: object,
+        sample_image_bytes: bytes,
+        valid_json_response: str,
+    ) -> None:
+        mock_model.return_value = valid_json_response  # type: ignore[attr-defined]
+
+        analyze(sample_image_bytes)
+
+        schema = mock_model.call_args.kwargs["json_schema"]  # type: ignore[attr-defined]
+        assert "severity" in schema["required"]
+        assert "raw_model_response" not in schema["properties"]
+        assert "parse_failed" not in schema["properties"]
+
+    @patch("src.agents.image_reader._model_analyze_image")
+    def test_requests_retry_with_larger_budget(
+        self,
+        mock_model: object,
+        sample_image_bytes: bytes,
+        valid_json_response: str,
+    ) -> None:
+        mock_model.return_value = valid_json_response  # type: ignore[attr-defined]
+
+        result = analyze(sample_image_bytes)
+
+        call_kwargs = mock_model.call_args.kwargs  # type: ignore[attr-defined]
+        assert call_kwargs["max_tokens"] == 384
+        assert call_kwargs["retry_max_tokens"] == 1024
+        assert result.parse_failed is False
+        assert result.raw_model_response == valid_json_response
+
     @patch("src.agents.image_reader._model_analyze_image")
     def test_api_error_returns_safe_default(
         self,
@@ -337,3 +386,56 @@ class TestAnalyze:
 
         assert result.severity == ImageSeverity.MODERATE
         assert result.parse_failed is True
+
+
+class TestAnalyzeAsync:
+    @patch("src.agents.image_reader._model_analyze_image_async")
+    def test_returns_findings(
+        self,
+        mock_model: object,
+        sample_image_bytes: bytes,
+        valid_json_response: str,
+    ) -> None:
+        mock_model.return_value = valid_json_response  # type: ignore[attr-defined]
+
+        result = asyncio.run(
+            analyze_async(sample_image_bytes, clinical_context="Fell from ladder")
+        )
+
+        assert result.severity == ImageSeverity.SEVERE
+        assert result.raw_model_response == valid_json_response
+        call_kwargs = mock_model.call_args  # type: ignore[attr-defined]
+        assert "Fell from ladder" in call_kwargs.kwargs["prompt"]
+
+    @patch("src.agents.image_reader._model_analyze_image_async")
+    def test_sends_same_request_as_sync(
+        self,
+        mock_model: object,
+        sample_image_bytes: bytes,
+        valid_json_response: str,
+    ) -> None:
+        mock_model.return_value = valid_json_response  # type: ignore[attr-defined]
+
+        async_result = asyncio.run(
+            analyze_async(sample_image_bytes, "image/png", "Fell from ladder")
+        )
+
+        with patch("src.agents.image_reader._model_analyze_image") as mock_sync:
+            mock_sync.return_value = valid_json_response
+            sync_result = analyze(sample_image_bytes, "image/png", "Fell from ladder")
+        assert mock_model.call_args == mock_sync.call_args  # type: ignore[attr-defined]
+        assert async_result == sync_result
+
+    @patch("src.agents.image_reader._model_analyze_image_async")
+    def test_api_error_returns_safe_default(
+        self,
+        mock_model: object,
+        sample_image_bytes: bytes,
+    ) -> None:
+        mock_model.side_effect = RuntimeError("API connection failed")  # type: ignore[attr-defined]
+
+        result = asyncio.run(analyze_async(sample_image_bytes))
+
+        assert result.severity == ImageSeverity.MODERATE
+        assert result.parse_failed is True
+        assert result.confidence == 0.0
@@ -1,5 +1,6 @@
 """Tests for the patient intake interviewer agent."""
 
+import asyncio
 import json
 from unittest.mock import patch
 
@@ -17,6 +18,8 @@ from src.agents.intake import (
     _parse_intake_response,
     get_patient_data,
     process_answer,
+    process_answer_async,
+    process_answers,
     start_interview,
 )
 from src.agents.triage import PatientData
@@ -161,6 +164,14 @@ class TestBuildIntakePrompt:
         prompt = _build_intake_prompt(state, "Test")
         assert "Conversation so far" not in prompt
 
+    def test_reflects_in_place_changes_to_extracted(
+        self, mid_interview_state: IntakeState
+    ) -> None:
+        _build_intake_prompt(mid_interview_state, "Há 2 horas")
+        mid_interview_state.extracted["onset"] = "2 horas"
+        prompt = _build_intake_prompt(mid_interview_state, "Muito forte")
+        assert "2 horas" in prompt
+
 
 # ---------------------------------------------------------------------------
 # Unit tests: response parsing
@@ -202,6 +213,18 @@ class TestParseIntakeResponse:
         result = _parse_intake_response(raw)
         assert result["next_question"] == "Qual a dor?"
 
+    def test_braces_inside_string_values(self) -> None:
+        raw = json.dumps(
+            {
+                "next_question": "Sente dor {forte} ou }leve{?",
+                "extracted_data": {"chief_complaint": "Dor"},
+                "is_complete": False,
+            }
+        )
+        result = _parse_intake_response(raw)
+        assert result["next_question"] == "Sente dor {forte} ou }leve{?"
+        assert result["extracted_data"]["chief_complaint"] == "Dor"
+
     def test_text_fallback_with_question_mark(self) -> None:
         raw = "Entendo, e quando começou essa dor?"
         result = _parse_intake_response(raw)
@@ -284,6 +307,19 @@ class TestMergeExtractedData:
         assert merged["vital_signs"]["heart_rate"] == 80
         assert merged["vital_signs"]["blood_pressure"] == "120/80"
 
+    def test_nested_dict_merge_does_not_mutate_previous(self) -> None:
+        previous = {"vital_signs": {"heart_rate": 80}}
+        new_data = {"vital_signs": {"heart_rate": None, "spo2": 97.0}}
+        merged = _merge_extracted_data(previous, new_data)
+        assert merged["vital_signs"] == {"heart_rate": 80, "spo2": 97.0}
+        assert previous == {"vital_signs": {"heart_rate": 80}}
+
+    def test_all_null_nested_dict_keeps_previous(self) -> None:
+        previous = {"vital_signs": {"heart_rate": 80}}
+        new_data = {"vital_signs": {"heart_rate": None}}
+        merged = _merge_extracted_data(previous, new_data)
+        assert merged["vital_signs"] is previous["vital_signs"]
+
     def test_all_null_dict_not_set(self) -> None:
         previous = {}
         new_data = {"vital_signs": {"heart_rate": None, "blood_pressure": None}}
@@ -595,6 +631,108 @@ class TestProcessAnswer:
         assert new_state.status == IntakeStatus.IN_PROGRESS
         assert new_state.pending_question is not None
 
+    @patch("src.agents.intake.generate_text")
+    def test_non_string_question_uses_fallback(
+        self,
+        mock_generate: object,
+        started_state: IntakeState,
+    ) -> None:
+        mock_generate.return_value = json.dumps(  # type: ignore[attr-defined]
+            {"next_question": 42, "extracted_data": {"chief_complaint": "Dor"}}
+        )
+
+        new_state = process_answer(started_state, "Dor")
+
+        assert isinstance(new_state.pending_question, str)
+        assert new_state.conversation[-1].content == new_state.pending_question
+
+
+# ---------------------------------------------------------------------------
+# Unit tests: process_answer_async
+# ---------------------------------------------------------------------------
+
+
+class TestProcessAnswerAsync:
+    @patch("src.agents.intake.generate_text_async")
+    def test_matches_sync_result(
+        self,
+        mock_generate: object,
+        started_state: IntakeState,
+        valid_model_response: str,
+    ) -> None:
+        mock_generate.return_value = valid_model_response  # type: ignore[attr-defined]
+
+        new_state = asyncio.run(process_answer_async(started_state, "Dor no peito"))
+
+        with patch("src.agents.intake.generate_text") as mock_sync:
+            mock_sync.return_value = valid_model_response
+            sync_state = process_answer(started_state, "Dor no peito")
+        assert new_state.model_dump() == sync_state.model_dump()
+
+    @patch("src.agents.intake.generate_text_async")
+    def test_sends_same_request_as_sync(
+        self,
+        mock_generate: object,
+        started_state: IntakeState,
+        valid_model_response: str,
+    ) -> None:
+        mock_generate.return_value = valid_model_response  # type: ignore[attr-defined]
+
+        asyncio.run(process_answer_async(started_state, "Dor no peito"))
+
+        with patch("src.agents.intake.generate_text") as mock_sync:
+            mock_sync.return_value = valid_model_response
+            process_answer(started_state, "Dor no peito")
+        assert mock_generate.call_args == mock_sync.call_args  # type: ignore[attr-defined]
+
+    @patch("src.agents.intake.generate_text_async")
+    def test_api_error_returns_fallback(
+        self, mock_generate: object, started_state: IntakeState
+    ) -> None:
+        mock_generate.side_effect = RuntimeError("API down")  # type: ignore[attr-defined]
+
+        new_state = asyncio.run(process_answer_async(started_state, "Dor"))
+
+        assert new_state.status == IntakeStatus.IN_PROGRESS
+        assert new_state.pending_question is not None
+        assert new_state.raw_extraction_response is None
+
+    def test_rejects_completed_state(self) -> None:
+        done = IntakeState(status=IntakeStatus.COMPLETE)
+        with pytest.raises(ValueError, match="COMPLETE"):
+            asyncio.run(process_answer_async(done, "Dor"))
+
+
+# ---------------------------------------------------------------------------
+# Unit tests: process_answers (concurrent interviews)
+# ---------------------------------------------------------------------------
+
+
+class TestProcessAnswers:
+    @patch("src.agents.intake.generate_text")
+    def test_processes_each_interview_in_order(
+        self, mock_generate: object, valid_model_response: str
+    ) -> None:
+        mock_generate.return_value = valid_model_response  # type: ignore[attr-defined]
+        states = [start_interview() for _ in range(3)]
+        answers = ["Dor no peito", "Febre", "Tosse"]
+
+        results = process_answers(list(zip(states, answers)))
+
+        assert len(results) == 3
+        assert mock_generate.call_count == 3  # type: ignore[attr-defined]
+        for result, answer in zip(results, answers):
+            assert result.turn_count == 1
+            assert result.conversation[1].content == answer
+
+    def test_empty_batch(self) -> None:
+        assert process_answers([]) == []
+
+    def test_rejects_completed_state(self) -> None:
+        done = IntakeState(status=IntakeStatus.COMPLETE)
+        with pytest.raises(ValueError, match="COMPLETE"):
+            process_answers([(start_interview(), "Dor"), (done, "Febre")])
+
 
 # ---------------------------------------------------------------------------
 # Unit tests: model call parameters
@@ -616,7 +754,52 @@ class TestModelCallParameters:
         mock_generate.assert_called_once()  # type: ignore[attr-defined]
         call_kwargs = mock_generate.call_args  # type: ignore[attr-defined]
         assert call_kwargs.kwargs["temperature"] == 0.3
-        assert call_kwargs.kwargs["max_tokens"] == 1024
+        assert call_kwargs.kwargs["max_tokens"] == 384
+
+    @patch("src.agents.intake.generate_text")
+    def test_requests_retry_with_larger_budget(
+        self,
+        mock_generate: object,
+        started_state: IntakeState,
+        valid_model_response: str,
+    ) -> None:
+        mock_generate.return_value = valid_model_response  # type: ignore[attr-defined]
+
+        result = process_answer(started_state, "Dor de cabeça")
+
+        call_kwargs = mock_generate.call_args.kwargs  # type: ignore[attr-defined]
+        assert call_kwargs["max_tokens"] == 384
+        assert call_kwargs["retry_max_tokens"] == 1024
+        assert result.raw_extraction_response == valid_model_response
+
+    @patch("src.agents.intake.generate_text")
+    def test_requests_guided_json_schema(
+        self,
+        mock_generate: object,
+        started_state: IntakeState,
+        valid_model_response: str,
+    ) -> None:
+        mock_generate.return_value = valid_model_response  # type: ignore[attr-defined]
+
+        process_answer(started_state, "Dor de cabeça")
+
+        schema = mock_generate.call_args.kwargs["json_schema"]  # type: ignore[attr-defined]
+        assert set(schema["properties"]) == {
+            "next_question",
+            "extracted_data",
+            "is_complete",
+            "clinical_notes",
+        }
+
+    @patch("src.agents.intake.generate_text")
+    def test_plain_text_response_not_retried(
+        self, mock_generate: object, started_state: IntakeState
+    ) -> None:
+        mock_generate.return_value = "Há quanto tempo sente dor?"  # type: ignore[attr-defined]
+
+        process_answer(started_state, "Dor de cabeça")
+
+        mock_generate.assert_called_once()  # type: ignore[attr-defined]
 
     @patch("src.agents.intake.generate_text")
     def test_system_prompt_content(
@@ -1,5 +1,6 @@
 """Tests for the Manchester Protocol triage classifier agent."""
 
+import asyncio
 import json
 from unittest.mock import patch
 
@@ -13,6 +14,7 @@ from src.agents.triage import (
     _build_user_prompt,
     _parse_triage_response,
     classify,
+    classify_many,
 )
 
 # ---------------------------------------------------------------------------
@@ -285,6 +287,32 @@ class TestParseTriageResponse:
         assert result["triage_color"] == "YELLOW"
         assert result["parse_failed"] is False
 
+    def test_non_list_discriminators_dropped(self) -> None:
+        raw = json.dumps(
+            {
+                "triage_color": "GREEN",
+                "reasoning": "Minor",
+                "key_discriminators": "limb problem",
+                "confidence": 0.8,
+            }
+        )
+        result = _parse_triage_response(raw)
+        assert result["key_discriminators"] == []
+
+    def test_braces_inside_string_values(self) -> None:
+        raw = json.dumps(
+            {
+                "triage_color": "GREEN",
+                "reasoning": "Stable vitals } no red flags {",
+                "key_discriminators": [],
+                "confidence": 0.8,
+            }
+        )
+        result = _parse_triage_response(raw)
+        assert result["triage_color"] == "GREEN"
+        assert result["reasoning"] == "Stable vitals } no red flags {"
+        assert result["parse_failed"] is False
+
 
 # ---------------------------------------------------------------------------
 # Unit tests: classify (mocked model)
@@ -396,10 +424,43 @@ class TestClassify:
 
         mock_generate.assert_called_once()  # type: ignore[attr-defined]
         call_kwargs = mock_generate.call_args  # type: ignore[attr-defined]
-        assert call_kwargs.kwargs["max_tokens"] == 1024
+        assert call_kwargs.kwargs["max_tokens"] == 256
         assert call_kwargs.kwargs["temperature"] == 0.1
+        assert call_kwargs.kwargs["stream"] is True
         assert "Manchester" in call_kwargs.kwargs["system_prompt"]
         assert "Headache" in call_kwargs.kwargs["prompt"]
+        schema = call_kwargs.kwargs["json_schema"]
+        assert set(schema["required"]) == {
+            "triage_color",
+            "reasoning",
+            "key_discriminators",
+            "confidence",
+        }
+
+    @patch("src.agents.triage.generate_text")
+    def test_requests_retry_with_larger_budget(
+        self,
+        mock_generate: object,
+        minimal_patient: PatientData,
+        valid_json_response: str,
+    ) -> None:
+        mock_generate.return_value = valid_json_response  # type: ignore[attr-defined]
+
+        classify(minimal_patient)
+
+        call_kwargs = mock_generate.call_args.kwargs  # type: ignore[attr-defined]
+        assert call_kwargs["max_tokens"] == 256
+        assert call_kwargs["retry_max_tokens"] == 1024
+
+    @patch("src.agents.triage.generate_text")
+    def test_malformed_complete_response_not_retried(
+        self, mock_generate: object, minimal_patient: PatientData
+    ) -> None:
+        mock_generate.return_value = '{"triage_color": RED}'  # type: ignore[attr-defined]
+
+        classify(minimal_patient)
+
+        mock_generate.assert_called_once()  # type: ignore[attr-defined]
 
     @patch("src.agents.triage.generate_text")
     def test_api_error_returns_safe_default(self, mock_generate: object) -> None:
@@ -412,6 +473,56 @@ class TestClassify:
         assert result.confidence == 0.0
 
 
+class TestClassifyMany:
+    def test_results_in_patient_order(self) -> None:
+        patients = [
+            PatientData(chief_complaint="Chest pain radiating to left arm"),
+            PatientData(chief_complaint="Sprained ankle"),
+        ]
+
+        results = asyncio.run(classify_many(patients))
+
+        assert [r.triage_color for r in results] == [
+            TriageColor.ORANGE,
+            TriageColor.GREEN,
+        ]
+
+    def test_empty_list(self) -> None:
+        assert asyncio.run(classify_many([])) == []
+
+    @patch("src.agents.triage.generate_text_batch")
+    def test_requests_retry_with_larger_budget(
+        self, mock_batch: object, valid_json_response: str
+    ) -> None:
+        mock_batch.return_value = [valid_json_response] * 2  # type: ignore[attr-defined]
+        patients = [PatientData(chief_complaint="Fever")] * 2
+
+        results = asyncio.run(classify_many(patients))
+
+        mock_batch.assert_called_once()  # type: ignore[attr-defined]
+        call_kwargs = mock_batch.call_args.kwargs  # type: ignore[attr-defined]
+        assert call_kwargs["max_tokens"] == 256
+        assert call_kwargs["retry_max_tokens"] == 1024
+        assert all(r.parse_failed is False for r in results)
+
+    @patch("src.agents.triage.generate_text_batch")
+    def test_failed_call_gets_safe_default(
+        self, mock_batch: object, valid_json_response: str
+    ) -> None:
+        mock_batch.return_value = [  # type: ignore[attr-defined]
+            valid_json_response,
+            RuntimeError("API connection failed"),
+        ]
+        patients = [PatientData(chief_complaint="Fever")] * 2
+
+        results = asyncio.run(classify_many(patients))
+
+        assert results[0].parse_failed is False
+        assert results[1].triage_color == TriageColor.YELLOW
+        assert results[1].parse_failed is True
+        assert results[1].confidence == 0.0
+
+
 # ---------------------------------------------------------------------------
 # Integration test (requires real model endpoint)
 # ---------------------------------------------------------------------------
@@ -0,0 +1,140 @@
+"""Tests for the FHIR R4 Bundle builder."""
+
+import pytest
+from fhir.resources.bundle import Bundle
+from pydantic import ValidationError
+
+from src.agents.triage import (
+    PatientData,
+    TriageColor,
+    TriageResult,
+    VitalSigns,
+)
+from src.fhir.builder import build_fhir_bundle
+
+# ---------------------------------------------------------------------------
+# Fixtures
+# ---------------------------------------------------------------------------
+
+
+@pytest.fixture
+def triage_result() -> TriageResult:
+    return TriageResult(
+        triage_color=TriageColor.ORANGE,
+        triage_level="Muito urgente",
+        max_wait_minutes=10,
+        reasoning="Acute chest pain requires urgent evaluation.",
+        key_discriminators=["chest pain"],
+        confidence=0.85,
+        raw_model_response="{}",
+    )
+
+
+@pytest.fixture
+def patient_data() -> PatientData:
+    return PatientData(
+        chief_complaint="Dor no peito",
+        vital_signs=VitalSigns(
+            heart_rate=110,
+            blood_pressure="180/100",
+            temperature=38.5,
+            spo2=94.0,
+            glucose=0,
+        ),
+    )
+
+
+def _resources(bundle: dict) -> dict[str, dict]:
+    return {e["resource"]["resourceType"]: e["resource"] for e in bundle["entry"]}
+
+
+# ---------------------------------------------------------------------------
+# Unit tests: bundle structure
+# ---------------------------------------------------------------------------
+
+
+class TestBuildFhirBundle:
+    def test_validates_as_fhir_r4(
+        self, patient_data: PatientData, triage_result: TriageResult
+    ) -> None:
+        bundle = build_fhir_bundle("Ana", 55, "F", patient_data, triage_result)
+        validated = Bundle.model_validate(bundle)
+        assert validated.model_dump(mode="json", exclude_none=True) == bundle
+
+    def test_validates_without_optional_data(self, triage_result: TriageResult) -> None:
+        patient = PatientData(chief_complaint="Tosse")
+        bundle = build_fhir_bundle("Paciente", None, None, patient, triage_result)
+        Bundle.model_validate(bundle)
+        assert "birthDate" not in _resources(bundle)["Patient"]
+
+    def test_empty_strings_are_omitted(self, triage_result: TriageResult) -> None:
+        patient = PatientData(chief_complaint="Tosse")
+        result = triage_result.model_copy(update={"reasoning": ""})
+        bundle = build_fhir_bundle("", None, None, patient, result)
+
+        Bundle.model_validate(bundle)
+        resources = _resources(bundle)
+        assert resources["Patient"]["name"] == [{"use": "official"}]
+        component_codes = [
+            c["code"].get("text") for c in resources["Observation"]["component"]
+        ]
+        assert "Reasoning" not in component_codes
+
+    def test_resources_reference_each_other(
+        self, patient_data: PatientData, triage_result: TriageResult
+    ) -> None:
+        resources = _resources(
+            build_fhir_bundle("Ana", 55, "F", patient_data, triage_result)
+        )
+        patient_ref = f"Patient/{resources['Patient']['id']}"
+        encounter_ref = f"Encounter/{resources['Encounter']['id']}"
+        assert resources["Encounter"]["subject"]["reference"] == patient_ref
+        assert resources["Observation"]["encounter"]["reference"] == encounter_ref
+        assert resources["Condition"]["subject"]["reference"] == patient_ref
+
+    def test_vital_components_skip_missing_and_zero(
+        self, patient_data: PatientData, triage_result: TriageResult
+    ) -> None:
+        observation = _resources(
+            build_fhir_bundle("Ana", 55, "F", patient_data, triage_result)
+        )["Observation"]
+        loinc_codes = [
+            c["code"]["coding"][0]["code"]
+            for c in observation["component"]
+            if "coding" in c["code"]
+        ]
+        # heart rate, blood pressure, temperature, SpO2; no RR, zero glucose
+        assert loinc_codes == ["8867-4", "85354-9", "8310-5", "2708-6"]
+
+    def test_bundles_share_no_mutable_state(
+        self, patient_data: PatientData, triage_result: TriageResult
+    ) -> None:
+        first = _resources(
+            build_fhir_bundle("Ana", 55, "F", patient_data, triage_result)
+        )
+        first["Encounter"]["class"][0]["coding"].clear()
+        first["Observation"]["code"]["text"] = "edited"
+        first["Observation"]["component"][-1]["code"]["coding"].clear()
+        first["Condition"]["clinicalStatus"]["coding"][0]["code"] = "resolved"
+
+        second = _resources(
+            build_fhir_bundle("Ana", 55, "F", patient_data, triage_result)
+        )
+        assert second["Encounter"]["class"][0]["coding"][0]["code"] == "EMER"
+        assert second["Observation"]["code"]["text"] != "edited"
+        assert second["Observation"]["component"][-1]["code"]["coding"]
+        assert second["Condition"]["clinicalStatus"]["coding"][0]["code"] == "active"
+
+    def test_strict_validation_flag(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+        patient_data: PatientData,
+        triage_result: TriageResult,
+    ) -> None:
+        # model_copy skips validation, so the bundle gets a non-numeric value
+        invalid = triage_result.model_copy(update={"confidence": "alta"})
+        build_fhir_bundle("Ana", 55, "F", patient_data, invalid)
+
+        monkeypatch.setattr("src.fhir.builder._STRICT_VALIDATION", True)
+        with pytest.raises(ValidationError):
+            build_fhir_bundle("Ana", 55, "F", patient_data, invalid)
@@ -1,22 +1,367 @@
-"""Integration tests for MedGemma model interface.
+"""Tests for the MedGemma model interface.
 
-These tests hit real Vertex AI endpoints. They require:
+Unit tests run against a mocked OpenAI client. Integration tests hit real
+Vertex AI endpoints and require:
     - GOOGLE_APPLICATION_CREDENTIALS_BASE64 set in .env
     - MEDGEMMA_27B_BASE_URL set in .env
     - MEDGEMMA_4B_BASE_URL set in .env
     - Both endpoints deployed and running
 """
 
+import asyncio
 import io
+from collections.abc import Iterator
+from unittest.mock import AsyncMock, MagicMock, patch
 
+import httpx
 import pytest
+from openai import BadRequestError
 from PIL import Image
 
-from src.models.medgemma import _get_token, analyze_image, generate_text
+from src.models import medgemma
+from src.models.medgemma import (
+    _get_token,
+    analyze_image,
+    generate_text,
+    generate_text_async,
+    generate_text_batch,
+)
 
-pytestmark = pytest.mark.integration
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
 
+_BASE_URL = "https://endpoint.test/v1/"
+_SCHEMA = {"type": "object"}
 
+
+def _completion(content: str, finish_reason: str = "stop") -> MagicMock:
+    """Build a non-streaming chat completion with one choice."""
+    choice = MagicMock(finish_reason=finish_reason)
+    choice.message.content = content
+    return MagicMock(choices=[choice])
+
+
+def _bad_request() -> BadRequestError:
+    request = httpx.Request("POST", _BASE_URL)
+    return BadRequestError(
+        "guided_json is not supported",
+        response=httpx.Response(400, request=request),
+        body=None,
+    )
+
+
+def _client(create: MagicMock) -> MagicMock:
+    client = MagicMock(base_url=httpx.URL(_BASE_URL))
+    client.chat.completions.create = create
+    return client
+
+
+@pytest.fixture(autouse=True)
+def _reset_guided_endpoints() -> Iterator[None]:
+    medgemma._GUIDED_UNSUPPORTED.clear()
+    yield
+    medgemma._GUIDED_UNSUPPORTED.clear()
+
+
+# ---------------------------------------------------------------------------
+# Unit tests: guided decoding fallback
+# ---------------------------------------------------------------------------
+
+
+class TestGuidedDecodingFallback:
+    def test_schema_sent_as_guided_json(self) -> None:
+        create = MagicMock(return_value=_completion("{}"))
+        with patch.object(medgemma, "_make_client", return_value=_client(create)):
+            generate_text("p", json_schema=_SCHEMA)
+
+        assert create.call_args.kwargs["extra_body"] == {"guided_json": _SCHEMA}
+
+    def test_rejected_guided_json_retried_without_and_remembered(self) -> None:
+        create = MagicMock(
+            side_effect=[_bad_request(), _completion("{}"), _completion("{}")]
+        )
+        with patch.object(medgemma, "_make_client", return_value=_client(create)):
+            assert generate_text("p", json_schema=_SCHEMA) == "{}"
+            generate_text("p", json_schema=_SCHEMA)
+
+        first, retry, later = create.call_args_list
+        assert first.kwargs["extra_body"] == {"guided_json": _SCHEMA}
+        assert "extra_body" not in retry.kwargs
+        assert later.kwargs["extra_body"] is None
+
+    def test_other_bad_request_still_raises(self) -> None:
+        create = MagicMock(side_effect=[_bad_request(), _bad_request()])
+        with patch.object(medgemma, "_make_client", return_value=_client(create)):
+            with pytest.raises(BadRequestError):
+                analyze_image(b"img", "p", json_schema=_SCHEMA)
+
+        assert medgemma._GUIDED_UNSUPPORTED == set()
+
+    def test_no_schema_bad_request_not_retried(self) -> None:
+        create = MagicMock(side_effect=_bad_request())
+        with patch.object(medgemma, "_make_client", return_value=_client(create)):
+            with pytest.raises(BadRequestError):
+                generate_text("p")
+
+        create.assert_called_once()
+
+    def test_async_rejected_guided_json_retried_without(self) -> None:
+        create = AsyncMock(side_effect=[_bad_request(), _completion("{}")])
+        client = _client(create)
+        client.__aenter__.return_value = client
+        with patch.object(medgemma, "_make_async_client", return_value=client):
+            result = asyncio.run(generate_text_async("p", json_schema=_SCHEMA))
+
+        assert result == "{}"
+        assert medgemma._GUIDED_UNSUPPORTED == {_BASE_URL}
+
+
+# ---------------------------------------------------------------------------
+# Unit tests: retry on token-limit truncation
+# ---------------------------------------------------------------------------
+
+
+def _stream(*deltas: str, finish_reason: str | None = None) -> MagicMock:
+    """Build a fake completion stream yielding one chunk per delta."""
+    chunks = []
+    for i, delta in enumerate(deltas):
+        choice = MagicMock(
+            finish_reason=finish_reason if i == len(deltas) - 1 else None
+        )
+        choice.delta.content = delta
+        chunks.append(MagicMock(choices=[choice]))
+    stream = MagicMock()
+    stream.__iter__.return_value = iter(chunks)
+    return stream
+
+
+class TestTruncationRetry:
+    def test_length_finish_retried_with_larger_budget(self) -> None:
+        create = MagicMock(
+            side_effect=[_completion('{"a": ', "length"), _completion('{"a": 1}')]
+        )
+        with patch.object(medgemma, "_make_client", return_value=_client(create)):
+            result = generate_text("p", max_tokens=256, retry_max_tokens=1024)
+
+        assert result == '{"a": 1}'
+        assert [c.kwargs["max_tokens"] for c in create.call_args_list] == [256, 1024]
+
+    def test_malformed_but_complete_reply_not_retried(self) -> None:
+        create = MagicMock(return_value=_completion('{"a": oops}', "stop"))
+        with patch.object(medgemma, "_make_client", return_value=_client(create)):
+            result = analyze_image(b"img", "p", max_tokens=384, retry_max_tokens=1024)
+
+        assert result == '{"a": oops}'
+        create.assert_called_once()
+
+    def test_no_retry_without_larger_budget(self) -> None:
+        create = MagicMock(return_value=_completion('{"a": ', "length"))
+        with patch.object(medgemma, "_make_client", return_value=_client(create)):
+            generate_text("p", max_tokens=256)
+
+        create.assert_called_once()
+
+    def test_streamed_reply_cut_off_is_retried(self) -> None:
+        create = MagicMock(
+            side_effect=[
+                _stream('{"a": ', '"b', finish_reason="length"),
+                _stream('{"a": "b"}'),
+            ]
+        )
+        with patch.object(medgemma, "_make_client", return_value=_client(create)):
+            result = generate_text(
+                "p", max_tokens=256, stream=True, retry_max_tokens=1024
+            )
+
+        assert result == '{"a": "b"}'
+        assert create.call_count == 2
+
+    def test_retry_is_not_streamed_to_on_delta(self) -> None:
+        create = MagicMock(
+            side_effect=[
+                _stream('{"a": ', '"b', finish_reason="length"),
+                _stream('{"a": "b"}'),
+            ]
+        )
+        deltas: list[str] = []
+        with patch.object(medgemma, "_make_client", return_value=_client(create)):
+            generate_text(
+                "p",
+                max_tokens=256,
+                stream=True,
+                on_delta=deltas.append,
+                retry_max_tokens=1024,
+            )
+
+        assert "".join(deltas) == '{"a": "b'
+
+    def test_batch_retries_only_cut_off_prompts(self) -> None:
+        def _reply(**kwargs: object) -> MagicMock:
+            prompt = kwargs["messages"][-1]["content"]  # type: ignore[index]
+            if prompt == "long" and kwargs["max_tokens"] == 256:
+                return _completion('{"a": ', "length")
+            return _completion(f'{{"p": "{prompt}"}}')
+
+        create = AsyncMock(side_effect=_reply)
+        client = _client(create)
+        client.__aenter__.return_value = client
+        with patch.object(medgemma, "_make_async_client", return_value=client):
+            results = asyncio.run(
+                generate_text_batch(
+                    ["short", "long"], max_tokens=256, retry_max_tokens=1024
+                )
+            )
+
+        assert results == ['{"p": "short"}', '{"p": "long"}']
+        assert create.call_count == 3
+
+
+# ---------------------------------------------------------------------------
+# Unit tests: early stream close
+# ---------------------------------------------------------------------------
+
+
+class TestReadUntilJsonCloses:
+    def test_closes_after_object_and_ignores_trailing_text(self) -> None:
+        stream = _stream('{"a": 1}', " trailing prose")
+
+        text, finish_reason = medgemma._read_until_json_closes(stream)
+
+        assert text == '{"a": 1}'
+        assert finish_reason == "stop"
+        stream.close.assert_called_once()
+
+    def test_brace_inside_string_value(self) -> None:
+        stream = _stream('{"a": "x } y", "b": "{"}', "tail")
+
+        text, _ = medgemma._read_until_json_closes(stream)
+
+        assert text == '{"a": "x } y", "b": "{"}'
+
+    def test_escaped_quote_inside_string(self) -> None:
+        stream = _stream('{"a": "say \\"}\\" now"}', "tail")
+
+        text, _ = medgemma._read_until_json_closes(stream)
+
+        assert text == '{"a": "say \\"}\\" now"}'
+
+    def test_prose_before_object(self) -> None:
+        stream = _stream("Here's the result:\n", '{"a": "b"}', "tail")
+
+        text, _ = medgemma._read_until_json_closes(stream)
+
+        assert text == 'Here\'s the result:\n{"a": "b"}'
+
+    def test_json_fence_before_object(self) -> None:
+        stream = _stream("```json\n", '{"a": {"b": 1}}', "\n```")
+
+        text, _ = medgemma._read_until_json_closes(stream)
+
+        assert text == '```json\n{"a": {"b": 1}}'
+        stream.close.assert_called_once()
+
+    def test_object_split_across_deltas(self) -> None:
+        stream = _stream('{"a', '": "x\\', '"y"', ', "b": {', "}", "}", "tail")
+        deltas: list[str] = []
+
+        text, _ = medgemma._read_until_json_closes(stream, on_delta=deltas.append)
+
+        assert text == '{"a": "x\\"y", "b": {}}'
+        assert "".join(deltas) == text
+        stream.close.assert_called_once()
+
+    def test_unclosed_stream_returns_full_text(self) -> None:
+        stream = _stream('{"a": ', '"b', finish_reason="length")
+
+        text, finish_reason = medgemma._read_until_json_closes(stream)
+
+        assert text == '{"a": "b'
+        assert finish_reason == "length"
+        stream.close.assert_not_called()
+
+
+# ---------------------------------------------------------------------------
+# Unit tests: credentials, client cache and batch concurrency
+# ---------------------------------------------------------------------------
+
+
+class TestTokenAndClients:
+    def test_valid_token_not_refreshed(self) -> None:
+        credentials = MagicMock(valid=True, token="tok")
+        with patch.object(medgemma, "_CREDENTIALS", credentials):
+            assert _get_token() == "tok"
+
+        credentials.refresh.assert_not_called()
+
+    def test_invalid_token_refreshed(self) -> None:
+        credentials = MagicMock(valid=False, token="old")
+
+        def _refresh(request: object) -> None:
+            credentials.valid = True
+            credentials.token = "new"
+
+        credentials.refresh.side_effect = _refresh
+        with patch.object(medgemma, "_CREDENTIALS", credentials):
+            assert _get_token() == "new"
+            assert _get_token() == "new"
+
+        credentials.refresh.assert_called_once()
+
+    def test_one_client_per_base_url_with_rotated_token(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setenv("MEDGEMMA_27B_BASE_URL", "https://a.test/v1/")
+        monkeypatch.setenv("MEDGEMMA_4B_BASE_URL", "https://b.test/v1/")
+        with (
+            patch.dict(medgemma._CLIENTS, clear=True),
+            patch.object(medgemma, "OpenAI") as openai,
+            patch.object(medgemma, "_get_token", side_effect=["t1", "t2", "t3"]),
+        ):
+            openai.side_effect = lambda **kwargs: MagicMock(**kwargs)
+            first = medgemma._make_client("MEDGEMMA_27B_BASE_URL")
+            second = medgemma._make_client("MEDGEMMA_27B_BASE_URL")
+            other = medgemma._make_client("MEDGEMMA_4B_BASE_URL")
+
+        assert first is second
+        assert first.api_key == "t2"
+        assert other is not first
+        assert other.api_key == "t3"
+        assert [c.kwargs["base_url"] for c in openai.call_args_list] == [
+            "https://a.test/v1/",
+            "https://b.test/v1/",
+        ]
+
+    def test_batch_limits_requests_in_flight(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr(medgemma, "MAX_BATCH_CONCURRENCY", 2)
+        in_flight = 0
+        peak = 0
+
+        async def _reply(**kwargs: object) -> MagicMock:
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return _completion("{}")
+
+        client = _client(AsyncMock(side_effect=_reply))
+        client.__aenter__.return_value = client
+        with patch.object(medgemma, "_make_async_client", return_value=client):
+            results = asyncio.run(generate_text_batch(["p"] * 6))
+
+        assert results == ["{}"] * 6
+        assert peak == 2
+
+
+# ---------------------------------------------------------------------------
+# Integration tests (require real model endpoints)
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.integration
 class TestCredentials:
     def test_credentials_available(self):
         """Can we obtain a GCP bearer token from the service account?"""
@@ -25,6 +370,7 @@ class TestCredentials:
         assert len(token) > 50  # bearer tokens are long
 
 
+@pytest.mark.integration
 class TestGenerateText:
     def test_medical_question(self):
         """27B responds to a Manchester Protocol question."""
@@ -65,6 +411,41 @@ class TestGenerateText:
         assert len(response) > 10
 
 
+@pytest.mark.integration
+class TestGenerateTextAsync:
+    def test_concurrent_calls(self):
+        """27B serves overlapping async requests."""
+
+        async def _run() -> list[str]:
+            return await asyncio.gather(
+                generate_text_async(
+                    prompt="Define fever in one sentence.", max_tokens=60
+                ),
+                generate_text_async(
+                    prompt="Define apnea in one sentence.", max_tokens=60
+                ),
+            )
+
+        responses = asyncio.run(_run())
+        assert len(responses) == 2
+        assert all(isinstance(r, str) and len(r) > 10 for r in responses)
+
+    def test_batch(self):
+        """27B answers a batch of prompts sent over one client."""
+        responses = asyncio.run(
+            generate_text_batch(
+                prompts=[
+                    "Define fever in one sentence.",
+                    "Define apnea in one sentence.",
+                ],
+                max_tokens=60,
+            )
+        )
+        assert len(responses) == 2
+        assert all(isinstance(r, str) and len(r) > 10 for r in responses)
+
+
+@pytest.mark.integration
 class TestAnalyzeImage:
     def test_synthetic_image(self):
         """4B responds to a synthetic image (solid red square)."""
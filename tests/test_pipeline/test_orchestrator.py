@@ -1,5 +1,7 @@
 """Tests for the LangGraph triage pipeline orchestrator."""
 
+import asyncio
+from collections.abc import Callable
 from unittest.mock import patch
 
 import pytest
@@ -12,12 +14,15 @@ from src.agents.triage import (
     VitalSigns,
 )
 from src.pipeline.orchestrator import (
+    _TRIAGE_CACHE,
     PipelineState,
     _should_analyze_image,
     build_graph,
     run_documentation,
     run_image_analysis,
+    run_parallel_analysis,
     run_pipeline,
+    run_pipeline_async,
     run_triage,
 )
 
@@ -86,7 +91,7 @@ class TestConditionalRouting:
             "image_bytes": b"fake-image",
             "errors": [],
         }
-        assert _should_analyze_image(state) == "run_image_analysis"
+        assert _should_analyze_image(state) == "run_parallel_analysis"
 
     def test_routes_to_triage_when_no_image(self, sample_patient: PatientData) -> None:
         state: PipelineState = {
@@ -192,6 +197,49 @@ class TestRunImageAnalysis:
             clinical_context=sample_patient.chief_complaint,
         )
 
+    def test_same_image_hits_cache(
+        self,
+        sample_patient: PatientData,
+        mock_image_findings: ImageFindings,
+    ) -> None:
+        state: PipelineState = {
+            "patient_data": sample_patient,
+            "image_bytes": b"img",
+            "errors": [],
+        }
+        other: PipelineState = {**state, "image_bytes": b"other-img"}
+        with patch(
+            "src.pipeline.orchestrator.analyze_image",
+            return_value=mock_image_findings,
+        ) as mock_call:
+            run_image_analysis(state)
+            result = run_image_analysis(state)
+            run_image_analysis(other)
+
+        assert mock_call.call_count == 2
+        assert result["image_findings"] == mock_image_findings
+        assert result["image_findings"] is not mock_image_findings
+
+    def test_parse_failure_not_cached(
+        self,
+        sample_patient: PatientData,
+        mock_image_findings: ImageFindings,
+    ) -> None:
+        failed = mock_image_findings.model_copy(update={"parse_failed": True})
+        state: PipelineState = {
+            "patient_data": sample_patient,
+            "image_bytes": b"img",
+            "errors": [],
+        }
+        with patch(
+            "src.pipeline.orchestrator.analyze_image",
+            return_value=failed,
+        ) as mock_call:
+            run_image_analysis(state)
+            run_image_analysis(state)
+
+        assert mock_call.call_count == 2
+
 
 class TestRunTriage:
     def test_returns_triage_result(
@@ -226,6 +274,247 @@ class TestRunTriage:
         assert "Triage classification failed" in result["errors"][0]
 
 
+class TestRedCriteria:
+    @pytest.mark.parametrize(
+        "vitals",
+        [
+            VitalSigns(spo2=80.0),
+            VitalSigns(heart_rate=190),
+            VitalSigns(heart_rate=35),
+            VitalSigns(respiratory_rate=40),
+        ],
+    )
+    def test_critical_vitals_skip_model(self, vitals: VitalSigns) -> None:
+        patient = PatientData(chief_complaint="Dispneia", vital_signs=vitals)
+        with patch("src.pipeline.orchestrator.classify_patient") as mock_classify:
+            result = run_triage({"patient_data": patient, "errors": []})
+
+        mock_classify.assert_not_called()
+        triage = result["triage_result"]
+        assert triage.triage_color == TriageColor.RED
+        assert triage.max_wait_minutes == 0
+        assert triage.confidence == 1.0
+        assert len(triage.key_discriminators) == 1
+
+    def test_borderline_vitals_use_model(
+        self, mock_triage_result: TriageResult
+    ) -> None:
+        patient = PatientData(
+            chief_complaint="Dispneia",
+            vital_signs=VitalSigns(spo2=85.0, heart_rate=180, respiratory_rate=35),
+        )
+        with patch(
+            "src.pipeline.orchestrator.classify_patient",
+            return_value=mock_triage_result,
+        ) as mock_classify:
+            result = run_triage({"patient_data": patient, "errors": []})
+
+        mock_classify.assert_called_once()
+        assert result["triage_result"] is mock_triage_result
+
+    def test_zero_vitals_mean_not_provided_and_use_model(
+        self, mock_triage_result: TriageResult
+    ) -> None:
+        patient = PatientData(
+            chief_complaint="Dispneia",
+            vital_signs=VitalSigns(spo2=0.0, heart_rate=0, respiratory_rate=0),
+        )
+        with patch(
+            "src.pipeline.orchestrator.classify_patient",
+            return_value=mock_triage_result,
+        ) as mock_classify:
+            result = run_triage({"patient_data": patient, "errors": []})
+
+        mock_classify.assert_called_once()
+        assert result["triage_result"] == mock_triage_result
+
+    def test_reasoning_follows_language(self) -> None:
+        patient = PatientData(
+            chief_complaint="Shortness of breath",
+            vital_signs=VitalSigns(spo2=70.0),
+        )
+        result = run_triage({"patient_data": patient, "lang": "en", "errors": []})
+
+        assert result["triage_result"].reasoning.startswith("Rule-based RED")
+
+
+class TestTriageCache:
+    def test_identical_patient_hits_cache(
+        self,
+        sample_patient: PatientData,
+        mock_triage_result: TriageResult,
+    ) -> None:
+        state: PipelineState = {"patient_data": sample_patient, "errors": []}
+        with patch(
+            "src.pipeline.orchestrator.classify_patient",
+            return_value=mock_triage_result,
+        ) as mock_classify:
+            run_triage(state)
+            result = run_triage(state)
+
+        assert mock_classify.call_count == 1
+        assert result["triage_result"] == mock_triage_result
+        assert result["triage_result"] is not mock_triage_result
+
+    def test_mutating_a_result_does_not_change_the_cache(
+        self,
+        sample_patient: PatientData,
+        mock_triage_result: TriageResult,
+    ) -> None:
+        state: PipelineState = {"patient_data": sample_patient, "errors": []}
+        reasoning = mock_triage_result.reasoning
+        with patch(
+            "src.pipeline.orchestrator.classify_patient",
+            return_value=mock_triage_result,
+        ):
+            first = run_triage(state)["triage_result"]
+            first.reasoning = "edited"
+            first.key_discriminators.append("edited")
+            second = run_triage(state)["triage_result"]
+
+        assert second.reasoning == reasoning
+        assert "edited" not in second.key_discriminators
+
+    def test_different_vitals_miss_cache(
+        self,
+        sample_patient: PatientData,
+        mock_triage_result: TriageResult,
+    ) -> None:
+        changed = sample_patient.model_copy(
+            update={"vital_signs": VitalSigns(heart_rate=111)}
+        )
+        with patch(
+            "src.pipeline.orchestrator.classify_patient",
+            return_value=mock_triage_result,
+        ) as mock_classify:
+            run_triage({"patient_data": sample_patient, "errors": []})
+            run_triage({"patient_data": changed, "errors": []})
+            run_triage({"patient_data": sample_patient, "lang": "en", "errors": []})
+
+        assert mock_classify.call_count == 3
+
+    def test_expired_entry_misses_cache(
+        self,
+        sample_patient: PatientData,
+        mock_triage_result: TriageResult,
+    ) -> None:
+        state: PipelineState = {"patient_data": sample_patient, "errors": []}
+        with (
+            patch(
+                "src.pipeline.orchestrator.classify_patient",
+                return_value=mock_triage_result,
+            ) as mock_classify,
+            patch("src.pipeline.orchestrator.time.monotonic") as mock_clock,
+        ):
+            mock_clock.return_value = 1000.0
+            run_triage(state)
+            mock_clock.return_value = 1000.0 + _TRIAGE_CACHE.ttl + 1
+            run_triage(state)
+
+        assert mock_classify.call_count == 2
+
+    def test_low_confidence_result_not_cached(
+        self,
+        sample_patient: PatientData,
+        mock_triage_result: TriageResult,
+    ) -> None:
+        low = mock_triage_result.model_copy(update={"confidence": 0.5})
+        state: PipelineState = {"patient_data": sample_patient, "errors": []}
+        with patch(
+            "src.pipeline.orchestrator.classify_patient",
+            return_value=low,
+        ) as mock_classify:
+            run_triage(state)
+            run_triage(state)
+
+        assert mock_classify.call_count == 2
+
+
+class TestRunParallelAnalysis:
+    def test_keeps_speculative_triage_when_image_cannot_raise_color(
+        self,
+        sample_patient: PatientData,
+        mock_triage_result: TriageResult,
+        mock_image_findings: ImageFindings,
+    ) -> None:
+        state: PipelineState = {
+            "patient_data": sample_patient,
+            "image_bytes": b"img",
+            "errors": [],
+        }
+        with (
+            patch(
+                "src.pipeline.orchestrator.classify_patient",
+                return_value=mock_triage_result,
+            ) as mock_classify,
+            patch(
+                "src.pipeline.orchestrator.analyze_image",
+                return_value=mock_image_findings,
+            ),
+        ):
+            result = run_parallel_analysis(state)
+
+        assert result["triage_result"] is mock_triage_result
+        assert result["image_findings"] is mock_image_findings
+        assert result["patient_data"].image_findings is not None
+        # Speculative triage sees the patient data without image findings
+        assert mock_classify.call_args.args[0].image_findings is None
+
+    def test_drops_speculative_triage_when_image_is_more_urgent(
+        self,
+        sample_patient: PatientData,
+        mock_triage_result: TriageResult,
+        mock_image_findings: ImageFindings,
+    ) -> None:
+        critical = mock_image_findings.model_copy(
+            update={"severity": ImageSeverity.CRITICAL}
+        )
+        state: PipelineState = {
+            "patient_data": sample_patient,
+            "image_bytes": b"img",
+            "errors": [],
+        }
+        with (
+            patch(
+                "src.pipeline.orchestrator.classify_patient",
+                return_value=mock_triage_result,
+            ),
+            patch(
+                "src.pipeline.orchestrator.analyze_image",
+                return_value=critical,
+            ),
+        ):
+            result = run_parallel_analysis(state)
+
+        assert "triage_result" not in result
+        assert result["image_findings"] is critical
+
+    def test_failed_speculative_triage_is_not_recorded(
+        self,
+        sample_patient: PatientData,
+        mock_image_findings: ImageFindings,
+    ) -> None:
+        state: PipelineState = {
+            "patient_data": sample_patient,
+            "image_bytes": b"img",
+            "errors": [],
+        }
+        with (
+            patch(
+                "src.pipeline.orchestrator.classify_patient",
+                side_effect=RuntimeError("Model timeout"),
+            ),
+            patch(
+                "src.pipeline.orchestrator.analyze_image",
+                return_value=mock_image_findings,
+            ),
+        ):
+            result = run_parallel_analysis(state)
+
+        assert "triage_result" not in result
+        assert "errors" not in result
+
+
 class TestRunDocumentation:
     def test_returns_none_without_triage_result(
         self, sample_patient: PatientData
@@ -253,7 +542,7 @@ class TestBuildGraph:
         graph = build_graph()
         compiled = graph.compile()
         node_names = set(compiled.get_graph().nodes.keys())
-        assert "run_image_analysis" in node_names
+        assert "run_parallel_analysis" in node_names
         assert "run_triage" in node_names
         assert "run_documentation" in node_names
 
@@ -310,6 +599,125 @@ class TestRunPipeline:
         assert result["patient_data"].image_findings is not None
         assert result["errors"] == []
 
+    def test_pipeline_retriages_with_severe_image(
+        self,
+        sample_patient: PatientData,
+        mock_triage_result: TriageResult,
+        mock_image_findings: ImageFindings,
+    ) -> None:
+        yellow = mock_triage_result.model_copy(
+            update={"triage_color": TriageColor.YELLOW}
+        )
+        severe = mock_image_findings.model_copy(
+            update={"severity": ImageSeverity.SEVERE}
+        )
+        with (
+            patch(
+                "src.pipeline.orchestrator.classify_patient",
+                return_value=yellow,
+            ) as mock_classify,
+            patch(
+                "src.pipeline.orchestrator.analyze_image",
+                return_value=severe,
+            ),
+        ):
+            result = run_pipeline(sample_patient, image_bytes=b"fake-xray")
+
+        assert mock_classify.call_count == 2
+        # The re-run triage sees the merged image findings
+        assert mock_classify.call_args.args[0].image_findings is not None
+        assert result["triage_result"] is not None
+        assert result["errors"] == []
+
+    def test_pipeline_critical_image_is_red_by_rule(
+        self,
+        sample_patient: PatientData,
+        mock_triage_result: TriageResult,
+        mock_image_findings: ImageFindings,
+    ) -> None:
+        critical = mock_image_findings.model_copy(
+            update={"severity": ImageSeverity.CRITICAL}
+        )
+        with (
+            patch(
+                "src.pipeline.orchestrator.classify_patient",
+                return_value=mock_triage_result,
+            ) as mock_classify,
+            patch(
+                "src.pipeline.orchestrator.analyze_image",
+                return_value=critical,
+            ),
+        ):
+            result = run_pipeline(sample_patient, image_bytes=b"fake-xray")
+
+        # Only the speculative triage reaches the model
+        assert mock_classify.call_count == 1
+        assert result["triage_result"].triage_color == TriageColor.RED
+        assert "Image severity CRITICAL" in result["triage_result"].key_discriminators
+
+    def test_pipeline_forwards_triage_deltas(
+        self,
+        sample_patient: PatientData,
+        mock_triage_result: TriageResult,
+    ) -> None:
+        def fake_classify(
+            patient: PatientData,
+            lang: str = "pt",
+            on_delta: Callable[[str], None] | None = None,
+        ) -> TriageResult:
+            assert on_delta is not None
+            on_delta('{"triage_color": "ORANGE", ')
+            on_delta('"reasoning": "Dor"}')
+            return mock_triage_result
+
+        deltas: list[str] = []
+        with patch(
+            "src.pipeline.orchestrator.classify_patient",
+            side_effect=fake_classify,
+        ):
+            run_pipeline(sample_patient, on_triage_delta=deltas.append)
+
+        assert "".join(deltas) == '{"triage_color": "ORANGE", "reasoning": "Dor"}'
+
+    def test_pipeline_does_not_stream_speculative_triage(
+        self,
+        sample_patient: PatientData,
+        mock_triage_result: TriageResult,
+        mock_image_findings: ImageFindings,
+    ) -> None:
+        callbacks: list[Callable[[str], None] | None] = []
+
+        def fake_classify(
+            patient: PatientData,
+            lang: str = "pt",
+            on_delta: Callable[[str], None] | None = None,
+        ) -> TriageResult:
+            callbacks.append(on_delta)
+            if on_delta is not None:
+                on_delta("{}")
+            return mock_triage_result
+
+        deltas: list[str] = []
+        with (
+            patch(
+                "src.pipeline.orchestrator.classify_patient",
+                side_effect=fake_classify,
+            ),
+            patch(
+                "src.pipeline.orchestrator.analyze_image",
+                return_value=mock_image_findings,
+            ),
+        ):
+            run_pipeline(
+                sample_patient,
+                image_bytes=b"fake-xray",
+                image_mime_type="image/png",
+                on_triage_delta=deltas.append,
+            )
+
+        assert callbacks[0] is None
+        assert deltas == ["{}"] * (len(callbacks) - 1)
+
     def test_pipeline_continues_after_image_failure(
         self,
         sample_patient: PatientData,
@@ -377,3 +785,30 @@ class TestRunPipeline:
         assert len(result["errors"]) == 2
         assert any("Image" in e for e in result["errors"])
         assert any("Triage" in e for e in result["errors"])
+
+
+class TestRunPipelineAsync:
+    def test_async_pipeline_with_image(
+        self,
+        sample_patient: PatientData,
+        mock_triage_result: TriageResult,
+        mock_image_findings: ImageFindings,
+    ) -> None:
+        with (
+            patch(
+                "src.pipeline.orchestrator.classify_patient",
+                return_value=mock_triage_result,
+            ),
+            patch(
+                "src.pipeline.orchestrator.analyze_image",
+                return_value=mock_image_findings,
+            ),
+        ):
+            result = asyncio.run(
+                run_pipeline_async(sample_patient, image_bytes=b"fake-xray")
+            )
+
+        assert result["triage_result"].triage_color == TriageColor.ORANGE
+        assert result["image_findings"].severity == ImageSeverity.MODERATE
+        assert result["fhir_bundle"]["resourceType"] == "Bundle"
+        assert result["errors"] == []
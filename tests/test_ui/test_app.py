@@ -0,0 +1,36 @@
+"""Tests for the Streamlit dashboard's pure helpers."""
+
+import json
+
+from src.ui.app import _partial_reasoning
+
+# ---------------------------------------------------------------------------
+# _partial_reasoning
+# ---------------------------------------------------------------------------
+
+
+class TestPartialReasoning:
+    def test_no_reasoning_key_yet(self) -> None:
+        assert _partial_reasoning('{"triage_color": "OR') == ""
+
+    def test_open_string_returns_text_so_far(self) -> None:
+        streamed = '{"triage_color": "ORANGE", "reasoning": "Dor torácica com'
+        assert _partial_reasoning(streamed) == "Dor torácica com"
+
+    def test_complete_reply(self) -> None:
+        streamed = json.dumps(
+            {"triage_color": "RED", "reasoning": "Via aérea comprometida."}
+        )
+        assert _partial_reasoning(streamed) == "Via aérea comprometida."
+
+    def test_escapes_are_decoded(self) -> None:
+        streamed = '{"reasoning": "Dor \\"forte\\" h\\u00e1 2h\\nsem febre"'
+        assert _partial_reasoning(streamed) == 'Dor "forte" há 2h\nsem febre'
+
+    def test_escape_cut_off_mid_sequence_is_dropped(self) -> None:
+        assert _partial_reasoning('{"reasoning": "Dor \\u00') == "Dor "
+        assert _partial_reasoning('{"reasoning": "Dor \\') == "Dor "
+
+    def test_later_keys_do_not_leak_into_reasoning(self) -> None:
+        streamed = '{"reasoning": "Febre alta", "key_discriminators": ["febre"'
+        assert _partial_reasoning(streamed) == "Febre alta"
@@ -1,5 +1,7 @@
 """Tests for the UI mock service layer."""
 
+import pytest
+
 from src.agents.triage import PatientData, TriageColor, TriageResult, VitalSigns
 from src.ui.mock_services import (
     SAMPLE_CASES,
@@ -235,6 +237,15 @@ class TestVitalSignBoundaries:
         result = self._classify_with_vitals(spo2=90.0)
         assert result.triage_color == TriageColor.ORANGE
 
+    def test_systolic_only_bp_is_parsed(self) -> None:
+        result = self._classify_with_vitals(blood_pressure="85")
+        assert result.triage_color == TriageColor.ORANGE
+
+    def test_unparseable_bp_is_skipped(self, caplog: pytest.LogCaptureFixture) -> None:
+        result = self._classify_with_vitals(blood_pressure="high")
+        assert result.triage_color == TriageColor.BLUE
+        assert "Could not parse blood pressure" in caplog.text
+
 
 # ---------------------------------------------------------------------------
 # mock_analyze_image